@@ -1,31 +1,54 @@
-from utils.utils import load_jsonl, retrieve_top_k_similar_docs
+from utils.utils import get_embeddings_batch, load_jsonl, report_embedding_cache
 from dotenv import load_dotenv
 import os
 import argparse
-from openai import OpenAI
-from pinecone import Pinecone
-import json
+import numpy as np
+from utils.backends import PINECONE_MAX_TOP_K, add_backend_arguments, index_key, open_index
+from utils.local_index import LocalIndex
+from utils.metrics import add_metrics_arguments, metrics, write_run_metrics
+from utils.namespace_config import namespace_dimensions
+from utils.record_store import RecordStore
+from utils.score_sketch import DEFAULT_BINS, DEFAULT_SKETCH_K, ScoreDistribution
+from utils.scoring import normalize_rows
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
 
-def create_multi_distribution_plot(all_data, start_idx, end_idx, filename):
-    fig, axes = plt.subplots(3, 5, figsize=(25, 15))
+# Scores held at once while streaming a local index (skill sets x block rows), about 16 MB of float32
+MAX_BLOCK_SCORES = 4 * 1024 ** 2
+REPORTED_QUANTILES = (0.05, 0.25, 0.75, 0.95)
+# Plot pages: a grid of PAGE_COLUMNS columns, the histograms merged into PLOT_BINS bins
+PLOTS_PER_PAGE = 15
+PAGE_COLUMNS = 5
+PLOT_BINS = 30
+DEFAULT_DPI = 150
+BAR_COLOR = '#4c72b0'
+
+def render_distribution_page(panels, filename, dpi=DEFAULT_DPI, columns=PAGE_COLUMNS):
+    """
+    Draw one page of histograms. panels holds precomputed (skill set index, counts, edges, mean, median, std),
+    so a worker process receives a few KB per skill set instead of the scores.
+    """
+    # Headless backend, selected before pyplot is imported (the plotting libraries take seconds to import)
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    
+    rows = -(-len(panels) // columns)
+    fig, axes = plt.subplots(rows, columns, figsize=(5 * columns, 5 * rows), squeeze=False)
     axes = axes.ravel()
     
-    for idx, (skill_idx, data) in enumerate(list(all_data.items())[start_idx:end_idx]):
-        ax = axes[idx]
-        df = pd.DataFrame(data['scores'])
-        
-        sns.histplot(data=df, x='similarity_score', bins=30, ax=ax)
+    for ax, (skill_idx, counts, edges, mean, median, std) in zip(axes, panels):
+        # One filled step artist per histogram instead of a patch per bar
+        ax.stairs(counts, edges, fill=True, color=BAR_COLOR)
+        ax.vlines(edges[1:-1], 0, np.minimum(counts[:-1], counts[1:]), colors='black', linewidth=0.5)
+        ax.stairs(counts, edges, color='black', linewidth=0.5)
         ax.set_title(f'Skill Set {skill_idx}', fontsize=10)
         ax.set_xlabel('Similarity Score', fontsize=8)
         ax.set_ylabel('Count', fontsize=8)
         
-        stats_text = f'Mean: {df["similarity_score"].mean():.4f}\n'
-        stats_text += f'Median: {df["similarity_score"].median():.4f}\n'
-        stats_text += f'Std: {df["similarity_score"].std():.4f}'
+        stats_text = f'Mean: {mean:.4f}\n'
+        stats_text += f'Median: {median:.4f}\n'
+        stats_text += f'Std: {std:.4f}'
         
         ax.text(0.95, 0.95, stats_text,
                 transform=ax.transAxes,
@@ -36,63 +59,125 @@ def create_multi_distribution_plot(all_data, start_idx, end_idx, filename):
         
         ax.tick_params(axis='both', which='major', labelsize=8)
     
-    plt.tight_layout()
-    plt.savefig(filename, dpi=300, bbox_inches='tight')
-    plt.close()
+    for ax in axes[len(panels):]:
+        ax.set_visible(False)
+    
+    # Fixed margins: tight_layout and bbox_inches='tight' each cost a full extra layout pass per page
+    fig.subplots_adjust(left=0.04, right=0.99, bottom=0.12 / rows, top=1 - 0.06 / rows, wspace=0.25,
+                        hspace=0.3)
+    fig.savefig(filename, dpi=dpi)
+    plt.close(fig)
+    return filename
+
+def create_distribution_plots(all_distributions, output_dir, per_page=PLOTS_PER_PAGE, dpi=DEFAULT_DPI,
+                              workers=None, bins=PLOT_BINS):
+    """
+    One page of per_page histograms for every block of skill sets (distributions_<first>_<last>.png),
+    pages rendered in parallel processes. Returns the paths of the pages.
+    """
+    panels = []
+    for skill_idx, distribution in all_distributions.items():
+        counts, edges = distribution.histogram(bins=bins)
+        panels.append((skill_idx, counts, edges, distribution.mean, distribution.median, distribution.std))
+    pages = [panels[start:start + per_page] for start in range(0, len(panels), per_page)]
+    filenames = [os.path.join(output_dir, f'distributions_{page[0][0]}_{page[-1][0]}.png') for page in pages]
+    
+    workers = min(len(pages), workers or os.cpu_count() or 1)
+    if workers <= 1:
+        return [render_distribution_page(page, filename, dpi) for page, filename in zip(pages, filenames)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(tqdm(executor.map(render_distribution_page, pages, filenames, [dpi] * len(pages)),
+                         total=len(pages), desc="Rendering plots"))
+
+def stream_local_scores(skill_embeddings, distributions, local_namespace, max_block_scores=MAX_BLOCK_SCORES):
+    """
+    Score every vector of a local namespace against all skill sets in one pass over the matrix.
+    Each (skill sets x rows) block of scores updates the distributions and is then discarded.
+    """
+    skills = normalize_rows(skill_embeddings)
+    matrix = local_namespace.search_matrix
+    block_size = max(1024, max_block_scores // max(1, len(skills)))
+    for start in tqdm(range(0, matrix.shape[0], block_size), desc="Scoring blocks"):
+        block = np.asarray(matrix[start:start + block_size], dtype=np.float32)
+        scores = skills @ block.T  # (skill sets, block rows)
+        for distribution, row in zip(distributions, scores):
+            distribution.update(row)
+
+def stream_index_scores(skill_embeddings, distributions, index, namespace, top_k):
+    """Pinecone: one query per skill set, the returned scores (at most top_k) update its distribution"""
+    for idx, (distribution, embedding) in enumerate(zip(distributions, tqdm(skill_embeddings)), start=1):
+        try:
+            # Scores only: Pinecone caps top_k much lower when metadata is included
+            matches = index.query(vector=embedding, namespace=namespace, top_k=top_k)['matches']
+        except Exception as e:
+            print(f"Error processing skill set {idx}: {str(e)}")
+            continue
+        distribution.update(np.fromiter((match['score'] for match in matches), dtype=np.float32, count=len(matches)))
+
+def write_stats(stats_path, idx, skills, distribution):
+    quantiles = distribution.quantiles(REPORTED_QUANTILES)
+    with open(stats_path, 'w') as f:
+        f.write(f"Skill Set {idx} Statistics:\n")
+        f.write(f"Skills: {skills}\n\n")
+        f.write(f"Scores: {distribution.count}\n")
+        f.write(f"Mean: {distribution.mean:.4f}\n")
+        f.write(f"Median: {distribution.median:.4f}\n")
+        f.write(f"Standard Deviation: {distribution.std:.4f}\n")
+        f.write(f"Min: {distribution.min:.4f}\n")
+        f.write(f"Max: {distribution.max:.4f}\n")
+        f.write("Quantiles: " + ', '.join(f"p{q * 100:g}={value:.4f}"
+                                          for q, value in zip(REPORTED_QUANTILES, quantiles)) + "\n")
 
 def analyze_similarities_by_set(args):
-    client = OpenAI(api_key=args.openai_api_key)
-    pc = Pinecone(api_key=args.pinecone_api_key)
-    index = pc.Index(args.index_name)
+    index = open_index(args.backend, args.index_name, args.local_index_dir,
+                       args.quantization, args.rescore_factor)
     
-    data = load_jsonl(args.data_path)
+    # Only the number of RFPs is needed: it is read from the record index instead of parsing the dataset
+    n_rfps = len(RecordStore(args.data_path))
     skill_sets = load_jsonl(args.skill_sets_path)
     
     os.makedirs(args.output_dir, exist_ok=True)
     
-    all_distributions = {}
+    # Each skill set keeps a fixed-size summary of its scores (histogram, moments, quantile sketch),
+    # so memory does not grow with the corpus
+    distributions = [ScoreDistribution(bins=args.bins, sketch_k=args.sketch_k) for _ in skill_sets]
     
-    for idx, skill_set in enumerate(tqdm(skill_sets), start=1):
-        scores = []
-        skills = skill_set['text']
-        
-        try:
-            retrieved_docs = retrieve_top_k_similar_docs(skills, index, args.namespace, k=len(data))
-            for doc in retrieved_docs:
-                scores.append({
-                    'rfp_id': data[int(doc['id'])]['postingId'],
-                    'similarity_score': doc['score']
-                })
-            
-            all_distributions[idx] = {
-                'skills': skills,
-                'scores': scores
-            }
-            
-            df = pd.DataFrame(scores)
-            stats_path = os.path.join(args.output_dir, f'skill_set_{idx}_stats.txt')
-            
-            with open(stats_path, 'w') as f:
-                f.write(f"Skill Set {idx} Statistics:\n")
-                f.write(f"Skills: {skills}\n\n")
-                f.write(f"Mean: {df['similarity_score'].mean():.4f}\n")
-                f.write(f"Median: {df['similarity_score'].median():.4f}\n")
-                f.write(f"Standard Deviation: {df['similarity_score'].std():.4f}\n")
-                f.write(f"Min: {df['similarity_score'].min():.4f}\n")
-                f.write(f"Max: {df['similarity_score'].max():.4f}\n")
-                
-        except Exception as e:
-            print(f"Error processing skill set {idx}: {str(e)}")
+    with metrics.stage('embed'):
+        # Queries are embedded with the dimensions the namespace was ingested with
+        skill_embeddings = get_embeddings_batch([skill_set['text'] for skill_set in skill_sets],
+                                                dimensions=namespace_dimensions(
+                                                    index_key(args.backend, args.index_name, args.local_index_dir),
+                                                    args.namespace))
+    
+    with metrics.stage('match'):
+        if isinstance(index, LocalIndex):
+            stream_local_scores(skill_embeddings, distributions, index.namespace(args.namespace),
+                                args.max_block_scores)
+        else:
+            top_k = min(n_rfps, PINECONE_MAX_TOP_K)
+            if top_k < n_rfps:
+                print(f"Pinecone returns at most {PINECONE_MAX_TOP_K} matches per query: "
+                      f"the distributions cover the top {top_k} of {n_rfps} RFPs")
+            stream_index_scores(skill_embeddings, distributions, index, args.namespace, top_k)
+    
+    all_distributions = {}
+    for idx, (skill_set, distribution) in enumerate(zip(skill_sets, distributions), start=1):
+        if not distribution.count:
             continue
+        all_distributions[idx] = distribution
+        write_stats(os.path.join(args.output_dir, f'skill_set_{idx}_stats.txt'), idx, skill_set['text'], distribution)
+    print(f"Summarized {sum(d.count for d in distributions)} scores of {len(distributions)} skill sets "
+          f"in {sum(d.nbytes for d in distributions) / 1024 ** 2:.2f} MB")
     
-    # Create distribution plots
-    plot_path_1 = os.path.join(args.output_dir, 'distributions_1_15.png')
-    plot_path_2 = os.path.join(args.output_dir, 'distributions_16_30.png')
+    # Create distribution plots, one page per plots_per_page skill sets
+    with metrics.stage('plots'):
+        pages = create_distribution_plots(all_distributions, args.output_dir, args.plots_per_page, args.dpi,
+                                          args.plot_workers)
+    print(f"Saved {len(pages)} plot pages to {args.output_dir}")
     
-    create_multi_distribution_plot(all_distributions, 0, 15, plot_path_1)
-    create_multi_distribution_plot(all_distributions, 15, 30, plot_path_2)
+    report_embedding_cache()
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser()
     
     # Data paths
@@ -106,12 +191,30 @@ def main():
                       help='Name of Pinecone index')
     parser.add_argument('--namespace', type=str, default='openai-no-chunk',
                       help='Namespace in Pinecone index')
+    add_backend_arguments(parser)
     
     # Output settings
     parser.add_argument('--output_dir', type=str, default='../../results/score_distributions',
                       help='Directory to save output files')
     
-    args = parser.parse_args()
+    # Streaming summaries
+    parser.add_argument('--bins', type=int, default=DEFAULT_BINS,
+                      help='Fixed histogram bins over the [-1, 1] score range')
+    parser.add_argument('--sketch_k', type=int, default=DEFAULT_SKETCH_K,
+                      help='Size of the KLL quantile sketch (rank error about 1.7 / k)')
+    parser.add_argument('--max_block_scores', type=int, default=MAX_BLOCK_SCORES,
+                      help='Scores computed at once when streaming a local index (bounds memory)')
+    
+    # Plots
+    parser.add_argument('--plots_per_page', type=int, default=PLOTS_PER_PAGE,
+                      help='Skill sets per plot page (pages are added for any number of skill sets)')
+    parser.add_argument('--plot_workers', type=int, default=None,
+                      help='Processes rendering the plot pages (default: one per CPU)')
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI,
+                      help='Resolution of the plot pages')
+    add_metrics_arguments(parser)
+    
+    args = parser.parse_args(argv)
     
     # Load API keys from environment
     load_dotenv()
@@ -119,6 +222,7 @@ def main():
     args.pinecone_api_key = os.environ.get("PINECONE_API_KEY")
     
     analyze_similarities_by_set(args)
+    write_run_metrics('similarity_score_distribution', args.metrics_json, args.metrics_prom)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
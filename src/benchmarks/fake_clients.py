@@ -0,0 +1,148 @@
+"""
+Deterministic stand-ins for the OpenAI clients used by the scripts, with configurable latency.
+
+Embeddings are derived from the text (sum of hashed word vectors, L2-normalised), so the same text always
+gets the same vector and texts sharing words get similar vectors. Responses mimic the attributes the scripts
+read from the real client (data[i].embedding, choices[0].message.content, usage).
+"""
+import asyncio
+import time
+import zlib
+from functools import lru_cache
+from types import SimpleNamespace
+
+import numpy as np
+
+DEFAULT_DIMENSIONS = 3072
+# Number of distinct word vectors; words are hashed into this table
+HASH_ROWS = 4096
+
+
+@lru_cache(maxsize=4)
+def _word_table(dimensions: int) -> np.ndarray:
+    return np.random.default_rng(0).standard_normal((HASH_ROWS, dimensions), dtype=np.float32)
+
+
+def text_embedding(text: str, dimensions: int = DEFAULT_DIMENSIONS) -> list:
+    """Deterministic text-derived unit vector"""
+    words = text.lower().split() or [""]
+    rows = [zlib.crc32(word.encode('utf-8')) % HASH_ROWS for word in words]
+    vector = _word_table(dimensions)[rows].sum(axis=0)
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _embedding_response(input, dimensions):
+    texts = [input] if isinstance(input, str) else list(input)
+    data = [SimpleNamespace(embedding=text_embedding(text, dimensions), index=i) for i, text in enumerate(texts)]
+    tokens = sum(_approx_tokens(text) for text in texts)
+    return SimpleNamespace(data=data, usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens))
+
+
+def _chat_response(messages, max_tokens, reply):
+    prompt_tokens = sum(_approx_tokens(message['content']) for message in messages)
+    completion_tokens = min(max_tokens or _approx_tokens(reply), _approx_tokens(reply))
+    message = SimpleNamespace(role='assistant', content=reply)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason='stop', index=0)],
+                           usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                                 total_tokens=prompt_tokens + completion_tokens))
+
+
+class FakeOpenAI:
+    """
+    Synchronous fake of openai.OpenAI (embeddings.create, chat.completions.create).
+    latency: seconds per request, latency_per_input: extra seconds per embedded text
+    """
+
+    def __init__(self, latency: float = 0.0, latency_per_input: float = 0.0,
+                 dimensions: int = DEFAULT_DIMENSIONS, reply: str = "no"):
+        self.latency = latency
+        self.latency_per_input = latency_per_input
+        self.dimensions = dimensions
+        self.reply = reply
+        self.calls = {'embeddings': 0, 'chat': 0}
+        self.embeddings = SimpleNamespace(create=self._create_embeddings)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+    def _create_embeddings(self, input, model=None, dimensions=None, **kwargs):
+        self.calls['embeddings'] += 1
+        n_inputs = 1 if isinstance(input, str) else len(input)
+        time.sleep(self.latency + self.latency_per_input * n_inputs)
+        return _embedding_response(input, dimensions or self.dimensions)
+
+    def _create_completion(self, messages, model=None, max_tokens=None, **kwargs):
+        self.calls['chat'] += 1
+        time.sleep(self.latency)
+        return _chat_response(messages, max_tokens, self.reply)
+
+    def close(self):
+        pass
+
+
+class FakeAsyncOpenAI:
+    """Asynchronous fake of openai.AsyncOpenAI (chat.completions.create and embeddings.create)"""
+
+    def __init__(self, latency: float = 0.0, dimensions: int = DEFAULT_DIMENSIONS, reply: str = "no"):
+        self.latency = latency
+        self.dimensions = dimensions
+        self.reply = reply
+        self.calls = {'embeddings': 0, 'chat': 0}
+        self.embeddings = SimpleNamespace(create=self._create_embeddings)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create_completion))
+
+    async def _create_embeddings(self, input, model=None, dimensions=None, **kwargs):
+        self.calls['embeddings'] += 1
+        await asyncio.sleep(self.latency)
+        return _embedding_response(input, dimensions or self.dimensions)
+
+    async def _create_completion(self, messages, model=None, max_tokens=None, **kwargs):
+        self.calls['chat'] += 1
+        await asyncio.sleep(self.latency)
+        return _chat_response(messages, max_tokens, self.reply)
+
+    async def close(self):
+        pass
+
+
+class FakePineconeIndex:
+    """
+    Wraps a LocalIndex with a per-request latency, to stand in for a remote Pinecone index.
+    Not a LocalIndex subclass, so the scripts take their Pinecone code paths.
+    """
+
+    def __init__(self, local_index, latency: float = 0.0):
+        self.local_index = local_index
+        self.latency = latency
+
+    def upsert(self, vectors, namespace=''):
+        time.sleep(self.latency)
+        return self.local_index.upsert(vectors=vectors, namespace=namespace)
+
+    def query(self, vector, top_k, namespace='', include_metadata=False, filter=None, **kwargs):
+        time.sleep(self.latency)
+        return self.local_index.query(vector=vector, top_k=top_k, namespace=namespace,
+                                      include_metadata=include_metadata, filter=filter)
+
+    def delete(self, ids, namespace=''):
+        time.sleep(self.latency)
+        return self.local_index.delete(ids=ids, namespace=namespace)
+
+    def fetch(self, ids, namespace=''):
+        time.sleep(self.latency)
+        return self.local_index.fetch(ids=ids, namespace=namespace)
+
+    def list_paginated(self, prefix=None, limit=100, pagination_token=None, namespace=''):
+        time.sleep(self.latency)
+        return self.local_index.list_paginated(prefix=prefix, limit=limit, pagination_token=pagination_token,
+                                               namespace=namespace)
+
+    def describe_index_stats(self):
+        time.sleep(self.latency)
+        return self.local_index.describe_index_stats()
+
+    def flush(self):
+        self.local_index.flush()
@@ -0,0 +1,240 @@
+"""
+End-to-end benchmarks of the ingest, matching, generation and analysis code paths.
+
+Runs the real functions of src/core and src/analysis on a synthetic corpus, with the OpenAI clients replaced by
+deterministic fakes of configurable latency and the vector index being a local index (optionally behind a
+fake network latency, to stand in for Pinecone). Timings are written as JSON so runs can be compared over time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from datetime import datetime, timezone
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# The benchmarked scripts live in src/core and src/analysis and import from src/utils
+for directory in ('', 'core', 'analysis'):
+    path = os.path.abspath(os.path.join(SRC_DIR, directory))
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from benchmarks.fake_clients import FakeAsyncOpenAI, FakeOpenAI, FakePineconeIndex  # noqa: E402
+from benchmarks.synthetic_corpus import generate_corpus  # noqa: E402
+
+SCENARIOS = ['ingest', 'ingest_pipelined', 'inference', 'similarity_scores',
+             'generation', 'generation_async', 'distribution']
+NAMESPACE = 'benchmark'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run the end-to-end benchmarks on a synthetic corpus')
+
+    # Corpus
+    parser.add_argument('--n_rfps', type=int, default=1000, help='Number of synthetic RFPs (1k to 1M)')
+    parser.add_argument('--n_skill_sets', type=int, default=30, help='Number of synthetic skill sets')
+    parser.add_argument('--mean_words', type=int, default=400, help='Typical description length in words')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic corpus')
+    parser.add_argument('--corpus_dir', type=str, default=None,
+                        help='Reuse data.jsonl / test_skill_sets.jsonl from this directory instead of generating them')
+    parser.add_argument('--work_dir', type=str, default=None,
+                        help='Directory for the corpus, index and outputs (default: a temporary directory)')
+
+    # Fakes
+    parser.add_argument('--backend', type=str, choices=['local', 'fake_pinecone'], default='local',
+                        help='Local index, or the local index behind --index_latency per request')
+    parser.add_argument('--dimensions', type=int, default=3072, help='Dimension of the fake embeddings')
+    parser.add_argument('--embedding_latency', type=float, default=0.05, help='Seconds per embedding request')
+    parser.add_argument('--embedding_latency_per_input', type=float, default=0.0,
+                        help='Additional seconds per embedded text')
+    parser.add_argument('--chat_latency', type=float, default=0.5, help='Seconds per chat completion')
+    parser.add_argument('--index_latency', type=float, default=0.02,
+                        help='Seconds per index request with --backend fake_pinecone')
+    parser.add_argument('--embedding_cache', action='store_true',
+                        help='Keep the on-disk embedding cache enabled (disabled by default so every run embeds)')
+
+    # Scenario settings
+    parser.add_argument('--scenarios', type=str, nargs='+', choices=SCENARIOS, default=SCENARIOS,
+                        help='Scenarios to run')
+    parser.add_argument('--top_k', type=int, default=3, help='top_k of the inference scenario')
+    parser.add_argument('--generation_count', type=int, default=20, help='Number of responses generated')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrency of generation_async')
+    parser.add_argument('--rpm', type=float, default=500, help='Requests per minute of generation_async')
+    parser.add_argument('--tpm', type=float, default=200000, help='Tokens per minute of generation_async')
+
+    parser.add_argument('--output_json', type=str, default=None,
+                        help='Results file (default: ../../results/benchmarks/benchmark_<timestamp>.json)')
+    return parser.parse_args()
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SRC_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenario(name, items, fn, results, clients=()):
+    """Time fn(); a failing scenario is recorded with its error instead of stopping the run"""
+    calls_before = [dict(client.calls) for client in clients]
+    print(f"Running {name}...")
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        traceback.print_exc()
+        results[name] = {'error': f"{type(e).__name__}: {e}"}
+        return
+    seconds = time.perf_counter() - start
+    results[name] = {'seconds': round(seconds, 4), 'items': items,
+                     'items_per_second': round(items / seconds, 2) if seconds else None}
+    api_calls = {}
+    for client, before in zip(clients, calls_before):
+        for kind, count in client.calls.items():
+            api_calls[kind] = api_calls.get(kind, 0) + count - before[kind]
+    if api_calls:
+        results[name]['api_calls'] = api_calls
+    print(f"  {results[name]}")
+
+
+def main():
+    args = parse_args()
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='rfp_benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+
+    # Isolate the run from the project's caches and namespace settings
+    if not args.embedding_cache:
+        os.environ['EMBEDDING_CACHE_PATH'] = ''
+    os.environ['NAMESPACE_CONFIG_PATH'] = os.path.join(work_dir, 'namespaces.json')
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+    from utils import utils
+    from utils.local_index import LocalIndex
+    from utils.metrics import metrics
+    from utils.tokenizer import TokenCounts
+
+    if args.corpus_dir:
+        data_path = os.path.join(args.corpus_dir, 'data.jsonl')
+        skill_sets_path = os.path.join(args.corpus_dir, 'test_skill_sets.jsonl')
+    else:
+        print(f"Generating {args.n_rfps} synthetic RFPs in {work_dir}...")
+        data_path, skill_sets_path = generate_corpus(work_dir, args.n_rfps, args.n_skill_sets,
+                                                     args.seed, args.mean_words)
+    n_rfps = sum(1 for _ in utils.iter_jsonl(data_path, fields=['postingId']))
+    skill_sets = utils.load_jsonl(skill_sets_path)
+
+    fake_client = FakeOpenAI(args.embedding_latency, args.embedding_latency_per_input, args.dimensions)
+    fake_chat_client = FakeOpenAI(args.chat_latency, dimensions=args.dimensions)
+    utils.client = fake_client
+
+    local_index = LocalIndex(os.path.join(work_dir, 'local_index'))
+    index = local_index if args.backend == 'local' else FakePineconeIndex(local_index, args.index_latency)
+    results = {}
+
+    import store_pinecone
+
+    def ingest(namespace, pipelined=False):
+        records = store_pinecone.iter_chunks_and_metadata_from_path(data_path)
+        if pipelined:
+            store_pinecone.store_vector_to_pinecone_pipelined(index, records, namespace, token_counts=TokenCounts())
+        else:
+            store_pinecone.store_vector_to_pinecone(index, records, namespace)
+        local_index.flush()
+
+    if 'ingest' in args.scenarios:
+        run_scenario('ingest', n_rfps, lambda: ingest(NAMESPACE), results, [fake_client])
+    else:
+        # The other scenarios need a populated namespace
+        ingest(NAMESPACE)
+    if 'ingest_pipelined' in args.scenarios:
+        run_scenario('ingest_pipelined', n_rfps, lambda: ingest(NAMESPACE + '-pipelined', pipelined=True),
+                     results, [fake_client])
+
+    if 'inference' in args.scenarios:
+        import inference
+
+        def run_inference():
+            inference.open_index = lambda *a, **kwargs: index
+            inference.main(['--namespace', NAMESPACE, '--data_path', data_path,
+                            '--skill_sets_path', skill_sets_path, '--top_k', str(args.top_k),
+                            '--output_results', os.path.join(work_dir, 'match_results.jsonl'),
+                            '--output_matched_docs', os.path.join(work_dir, 'matched_docs.txt'),
+                            '--output_match_scores', os.path.join(work_dir, 'match_scores.txt'),
+                            '--metrics_json', os.path.join(work_dir, 'inference_metrics.json')])
+
+        run_scenario('inference', len(skill_sets), run_inference, results, [fake_client])
+
+    if any(name in args.scenarios for name in ('similarity_scores', 'generation', 'generation_async')):
+        import generate_responses
+        generate_responses.openai_client = fake_client
+        data = utils.load_jsonl(data_path, fields=['postingId'])
+
+        if 'similarity_scores' in args.scenarios:
+            run_scenario('similarity_scores', n_rfps,
+                         lambda: generate_responses.calculate_similarity_scores(skill_sets, data, index, NAMESPACE),
+                         results, [fake_client])
+
+        descriptions = [record['description'] for record, _ in
+                        zip(utils.iter_jsonl(data_path, fields=['description']), range(args.generation_count))]
+        if 'generation' in args.scenarios:
+            def run_generation():
+                generate_responses.openai_client = fake_chat_client
+                try:
+                    for description in descriptions:
+                        generate_responses.generate_response(description)
+                finally:
+                    generate_responses.openai_client = fake_client
+
+            run_scenario('generation', len(descriptions), run_generation, results, [fake_chat_client])
+
+        if 'generation_async' in args.scenarios:
+            async_client = FakeAsyncOpenAI(args.chat_latency, args.dimensions)
+            run_scenario('generation_async', len(descriptions),
+                         lambda: asyncio.run(generate_responses.generate_responses_async(
+                             descriptions, args.concurrency, args.rpm, args.tpm,
+                             token_counts=TokenCounts(), client=async_client)),
+                         results, [async_client])
+
+    if 'distribution' in args.scenarios:
+        def run_distribution():
+            import similarity_score_distribution
+            similarity_score_distribution.open_index = lambda *a, **kwargs: index
+            similarity_score_distribution.analyze_similarities_by_set(argparse.Namespace(
+                openai_api_key=os.environ['OPENAI_API_KEY'], backend='local', index_name='benchmark',
+                local_index_dir=work_dir, quantization='none', rescore_factor=0, namespace=NAMESPACE,
+                data_path=data_path, skill_sets_path=skill_sets_path,
+                output_dir=os.path.join(work_dir, 'score_distributions'), bins=similarity_score_distribution.DEFAULT_BINS,
+                sketch_k=similarity_score_distribution.DEFAULT_SKETCH_K,
+                max_block_scores=similarity_score_distribution.MAX_BLOCK_SCORES,
+                plots_per_page=similarity_score_distribution.PLOTS_PER_PAGE, plot_workers=None,
+                dpi=similarity_score_distribution.DEFAULT_DPI))
+
+        run_scenario('distribution', len(skill_sets), run_distribution, results, [fake_client])
+
+    output_json = args.output_json or os.path.join(
+        '../../results/benchmarks', f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    directory = os.path.dirname(output_json)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(output_json, 'w', encoding='utf-8') as f:
+        json.dump({
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': dict(vars(args), n_rfps=n_rfps, n_skill_sets=len(skill_sets), work_dir=work_dir),
+            'scenarios': results,
+            # Per-call latencies and counters of all scenarios together (see utils/metrics.py)
+            'metrics': metrics.to_dict(),
+        }, f, indent=2)
+    print(f"Results saved to {output_json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Local HTTP stand-in for the OpenAI and Pinecone APIs used by the scripts, for offline load tests.
+
+OpenAI:   POST /v1/embeddings, POST /v1/chat/completions
+Pinecone: POST /vectors/upsert, POST /query, POST /vectors/delete, GET /vectors/list, GET /vectors/fetch,
+          GET /describe_index_stats (in-memory index)
+
+Embeddings are deterministic and derived from the text (see fake_clients.text_embedding).
+Latency, random 429 responses and rate limits (with OpenAI-style x-ratelimit-* headers) are configurable.
+Point the scripts at it with:
+    OPENAI_BASE_URL=http://localhost:8100/v1
+    PINECONE_HOST=http://localhost:8100
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+import uuid
+
+import numpy as np
+from aiohttp import web
+
+# Query filters are evaluated with the local index's implementation (src/utils)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from fake_clients import DEFAULT_DIMENSIONS, _approx_tokens, text_embedding  # noqa: E402
+from utils.field_index import FieldIndex, filter_mask  # noqa: E402
+
+
+class RateLimits:
+    """Requests and tokens per minute over a fixed one-minute window (0 disables a limit)"""
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window_start = time.monotonic()
+        self.requests = 0
+        self.tokens = 0
+
+    def _roll(self, now: float) -> None:
+        if now - self.window_start >= 60:
+            self.window_start = now
+            self.requests = 0
+            self.tokens = 0
+
+    def admit(self, tokens: int) -> bool:
+        now = time.monotonic()
+        self._roll(now)
+        if self.requests_per_minute and self.requests + 1 > self.requests_per_minute:
+            return False
+        if self.tokens_per_minute and self.tokens + tokens > self.tokens_per_minute:
+            return False
+        self.requests += 1
+        self.tokens += tokens
+        return True
+
+    def headers(self) -> dict:
+        reset = max(0.0, 60 - (time.monotonic() - self.window_start))
+        headers = {}
+        if self.requests_per_minute:
+            headers.update({
+                'x-ratelimit-limit-requests': str(self.requests_per_minute),
+                'x-ratelimit-remaining-requests': str(max(0, self.requests_per_minute - self.requests)),
+                'x-ratelimit-reset-requests': f"{reset:.3f}s",
+            })
+        if self.tokens_per_minute:
+            headers.update({
+                'x-ratelimit-limit-tokens': str(self.tokens_per_minute),
+                'x-ratelimit-remaining-tokens': str(max(0, self.tokens_per_minute - self.tokens)),
+                'x-ratelimit-reset-tokens': f"{reset:.3f}s",
+            })
+        return headers
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(60 - (time.monotonic() - self.window_start)))
+
+
+class MemoryNamespace:
+    """Growable float32 matrix of L2-normalised rows plus the id map of one namespace"""
+
+    def __init__(self):
+        self.ids = []
+        self.metadata = []
+        self.id_to_row = {}
+        self.matrix = None
+        self.field_indexes = {}
+
+    def field_index(self, field: str) -> FieldIndex:
+        if field not in self.field_indexes:
+            self.field_indexes[field] = FieldIndex([metadata.get(field) for metadata in self.metadata])
+        return self.field_indexes[field]
+
+    def upsert(self, vectors: list) -> int:
+        values = np.asarray([vector['values'] for vector in vectors], dtype=np.float32)
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values = values / np.where(norms == 0, 1, norms)
+        self.field_indexes = {}
+        if self.matrix is None:
+            self.matrix = np.empty((max(1024, len(vectors)), values.shape[1]), dtype=np.float32)
+        for vector, row_values in zip(vectors, values):
+            row = self.id_to_row.get(vector['id'])
+            if row is None:
+                row = len(self.ids)
+                if row == self.matrix.shape[0]:
+                    # Double the capacity instead of growing row by row
+                    self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+                self.id_to_row[vector['id']] = row
+                self.ids.append(vector['id'])
+                self.metadata.append(vector.get('metadata') or {})
+            else:
+                self.metadata[row] = vector.get('metadata') or {}
+            self.matrix[row] = row_values
+        return len(vectors)
+
+    def delete(self, ids: list) -> None:
+        ids = set(ids)
+        self.field_indexes = {}
+        keep = [row for row, vector_id in enumerate(self.ids) if vector_id not in ids]
+        if self.matrix is not None:
+            self.matrix = np.ascontiguousarray(self.matrix[keep]) if keep else None
+        self.ids = [self.ids[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self.id_to_row = {vector_id: row for row, vector_id in enumerate(self.ids)}
+
+    def query(self, vector: list, top_k: int, include_metadata: bool, include_values: bool,
+              metadata_filter: dict = None) -> list:
+        if not self.ids:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = self.matrix[:len(self.ids)] @ (query / norm if norm else query)
+        if metadata_filter:
+            scores = np.where(filter_mask(metadata_filter, self.field_index, len(self.ids)), scores, -np.inf)
+        top_k = min(top_k, int(np.isfinite(scores).sum()))
+        if not top_k:
+            return []
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        matches = []
+        for row in candidates[np.argsort(-scores[candidates], kind='stable')]:
+            match = {'id': self.ids[row], 'score': float(scores[row])}
+            if include_metadata:
+                match['metadata'] = self.metadata[row]
+            if include_values:
+                match['values'] = self.matrix[row].tolist()
+            matches.append(match)
+        return matches
+
+
+class StandInServer:
+    def __init__(self, args):
+        self.args = args
+        self.openai_limits = RateLimits(args.rpm, args.tpm)
+        self.namespaces = {}
+        self.random = random.Random(args.seed)
+
+    def namespace(self, name: str) -> MemoryNamespace:
+        return self.namespaces.setdefault(name or '', MemoryNamespace())
+
+    async def _openai_gate(self, tokens: int):
+        """Random 429s and rate limits; returns the error response or None if the request is admitted"""
+        if self.args.error_rate and self.random.random() < self.args.error_rate:
+            return self._rate_limited("Simulated rate limit error")
+        if not self.openai_limits.admit(tokens):
+            return self._rate_limited("Rate limit reached")
+        return None
+
+    def _rate_limited(self, message: str):
+        headers = dict(self.openai_limits.headers(), **{'retry-after': str(self.openai_limits.retry_after())})
+        return web.json_response({'error': {'message': message, 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                                 status=429, headers=headers)
+
+    async def embeddings(self, request):
+        body = await request.json()
+        texts = body['input'] if isinstance(body['input'], list) else [body['input']]
+        tokens = sum(_approx_tokens(text) for text in texts)
+        error = await self._openai_gate(tokens)
+        if error is not None:
+            return error
+        await asyncio.sleep(self.args.latency + self.args.latency_per_input * len(texts))
+        dimensions = body.get('dimensions') or self.args.dimensions
+        return web.json_response({
+            'object': 'list',
+            'data': [{'object': 'embedding', 'index': i, 'embedding': text_embedding(text, dimensions)}
+                     for i, text in enumerate(texts)],
+            'model': body.get('model'),
+            'usage': {'prompt_tokens': tokens, 'total_tokens': tokens},
+        }, headers=self.openai_limits.headers())
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        prompt_tokens = sum(_approx_tokens(str(message.get('content', ''))) for message in body['messages'])
+        error = await self._openai_gate(prompt_tokens + (body.get('max_tokens') or 0))
+        if error is not None:
+            return error
+        await asyncio.sleep(self.args.chat_latency)
+        reply = self.args.reply
+        if (body.get('response_format') or {}).get('type') == 'json_object':
+            # Batched classifier prompts ("1. ...\n\n2. ...") expect one answer per numbered description
+            numbers = re.findall(r'(?:^|\n\n)(\d+)\. ', body['messages'][-1]['content'])
+            count = max(map(int, numbers)) if numbers else 1
+            reply = json.dumps({'answers': [self.args.reply] * count})
+        completion_tokens = _approx_tokens(reply)
+        return web.json_response({
+            'id': f"chatcmpl-{uuid.uuid4().hex}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens},
+        }, headers=self.openai_limits.headers())
+
+    async def upsert(self, request):
+        body = await request.json()
+        await asyncio.sleep(self.args.index_latency)
+        return web.json_response({'upsertedCount': self.namespace(body.get('namespace')).upsert(body['vectors'])})
+
+    async def query(self, request):
+        body = await request.json()
+        await asyncio.sleep(self.args.index_latency)
+        namespace = body.get('namespace', '')
+        matches = self.namespace(namespace).query(body['vector'], body.get('topK', 10),
+                                                  body.get('includeMetadata', False), body.get('includeValues', False),
+                                                  body.get('filter'))
+        return web.json_response({'matches': matches, 'namespace': namespace, 'usage': {'readUnits': 1}})
+
+    async def delete(self, request):
+        body = await request.json()
+        await asyncio.sleep(self.args.index_latency)
+        namespace = body.get('namespace', '')
+        if body.get('deleteAll'):
+            self.namespaces.pop(namespace, None)
+        else:
+            self.namespace(namespace).delete(body.get('ids', []))
+        return web.json_response({})
+
+    async def list_vectors(self, request):
+        await asyncio.sleep(self.args.index_latency)
+        namespace = request.query.get('namespace', '')
+        prefix = request.query.get('prefix', '')
+        limit = int(request.query.get('limit', 100))
+        ids = [vector_id for vector_id in self.namespace(namespace).ids if vector_id.startswith(prefix)]
+        start = int(request.query.get('paginationToken') or 0)
+        body = {'vectors': [{'id': vector_id} for vector_id in ids[start:start + limit]], 'namespace': namespace,
+                'usage': {'readUnits': 1}}
+        if start + limit < len(ids):
+            body['pagination'] = {'next': str(start + limit)}
+        return web.json_response(body)
+
+    async def fetch(self, request):
+        await asyncio.sleep(self.args.index_latency)
+        namespace = request.query.get('namespace', '')
+        memory_namespace = self.namespace(namespace)
+        vectors = {}
+        for vector_id in request.query.getall('ids', []):
+            row = memory_namespace.id_to_row.get(vector_id)
+            if row is not None:
+                vectors[vector_id] = {'id': vector_id, 'values': memory_namespace.matrix[row].tolist(),
+                                      'metadata': memory_namespace.metadata[row]}
+        return web.json_response({'vectors': vectors, 'namespace': namespace, 'usage': {'readUnits': 1}})
+
+    async def describe_index_stats(self, request):
+        namespaces = {name: {'vectorCount': len(ns.ids)} for name, ns in self.namespaces.items()}
+        dimension = next((ns.matrix.shape[1] for ns in self.namespaces.values() if ns.matrix is not None), 0)
+        return web.json_response({'namespaces': namespaces, 'dimension': dimension,
+                                  'totalVectorCount': sum(len(ns.ids) for ns in self.namespaces.values())})
+
+    def app(self) -> web.Application:
+        # Embedding requests of large batches exceed the default 1 MB body limit
+        app = web.Application(client_max_size=256 * 1024 ** 2)
+        app.router.add_post('/v1/embeddings', self.embeddings)
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        app.router.add_post('/vectors/upsert', self.upsert)
+        app.router.add_post('/query', self.query)
+        app.router.add_post('/vectors/delete', self.delete)
+        app.router.add_get('/vectors/list', self.list_vectors)
+        app.router.add_get('/vectors/fetch', self.fetch)
+        app.router.add_route('*', '/describe_index_stats', self.describe_index_stats)
+        return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Local stand-in for the OpenAI and Pinecone APIs')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8100, help='Port to listen on')
+    parser.add_argument('--dimensions', type=int, default=DEFAULT_DIMENSIONS,
+                        help='Embedding dimension when a request does not ask for one')
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds per embedding request')
+    parser.add_argument('--latency_per_input', type=float, default=0.0, help='Additional seconds per embedded text')
+    parser.add_argument('--chat_latency', type=float, default=0.5, help='Seconds per chat completion')
+    parser.add_argument('--index_latency', type=float, default=0.01, help='Seconds per Pinecone request')
+    parser.add_argument('--rpm', type=int, default=0, help='OpenAI requests per minute before 429s (0: unlimited)')
+    parser.add_argument('--tpm', type=int, default=0, help='OpenAI tokens per minute before 429s (0: unlimited)')
+    parser.add_argument('--error_rate', type=float, default=0.0,
+                        help='Fraction of OpenAI requests answered with a random 429')
+    parser.add_argument('--reply', type=str, default='no', help='Content of every chat completion')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random 429s')
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    print(f"Stand-in API on http://{args.host}:{args.port} "
+          f"(OPENAI_BASE_URL=http://{args.host}:{args.port}/v1, PINECONE_HOST=http://{args.host}:{args.port})")
+    web.run_app(StandInServer(args).app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
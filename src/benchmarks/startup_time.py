@@ -0,0 +1,80 @@
+"""
+Startup time of the `rfp` commands: wall time of `python rfp.py <command> --help` (interpreter start, imports,
+argument parsing), compared with a target so import-time regressions are caught.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+RFP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'core', 'rfp.py')
+# `serve` is left out by default: it is long running and imports its HTTP stack up front
+COMMANDS = ['extract', 'filter', 'ingest', 'match', 'generate', 'analyze', 'evaluate']
+DEFAULT_TARGET_SECONDS = 0.5
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Measure the startup time of the rfp commands')
+    parser.add_argument('--commands', type=str, nargs='+', default=COMMANDS, help='Commands to measure')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs per command (the median is reported)')
+    parser.add_argument('--target', type=float, default=DEFAULT_TARGET_SECONDS,
+                        help='Maximum median startup time in seconds; exit code 1 if a command is slower')
+    parser.add_argument('--show_imports', type=int, default=0,
+                        help='Also list the N slowest imports of each command (python -X importtime)')
+    parser.add_argument('--output_json', type=str, default=None, help='Optional results file')
+    return parser.parse_args()
+
+
+def time_command(arguments: list, repeats: int) -> float:
+    """Median wall time of running the command `repeats` times"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + arguments, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def slowest_imports(command: str, n: int) -> list:
+    """(module, cumulative seconds) of the n slowest top-level imports of a command"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', RFP_PATH, command, '--help'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"; top-level imports are not indented
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\S.*)$', line)
+        if match:
+            imports.append((match.group(2), int(match.group(1)) / 1e6))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:n]
+
+
+def main():
+    args = parse_args()
+    interpreter = time_command(['-c', 'pass'], args.repeats)
+    print(f"{'python -c pass':<24} {interpreter * 1000:8.1f} ms")
+
+    results = {}
+    for command in args.commands:
+        seconds = time_command([RFP_PATH, command, '--help'], args.repeats)
+        results[command] = round(seconds, 4)
+        status = 'ok' if seconds <= args.target else 'SLOW'
+        print(f"{'rfp ' + command + ' --help':<24} {seconds * 1000:8.1f} ms  {status}")
+        for module, module_seconds in slowest_imports(command, args.show_imports):
+            print(f"    {module:<40} {module_seconds * 1000:8.1f} ms")
+
+    slow = [command for command, seconds in results.items() if seconds > args.target]
+    if args.output_json:
+        with open(args.output_json, 'w', encoding='utf-8') as f:
+            json.dump({'target_seconds': args.target, 'interpreter_seconds': round(interpreter, 4),
+                       'commands': results, 'slow': slow}, f, indent=2)
+    if slow:
+        print(f"Above the {args.target * 1000:.0f} ms target: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Synthetic RFP corpus generator.
+
+Writes data.jsonl-shaped RFP records (same keys as extract_data.py output) and test_skill_sets.jsonl-shaped
+skill sets, deterministically from a seed, at any scale (records are streamed to disk).
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+DEPARTMENTS = [
+    "Department of Energy", "Department of Defense", "Department of the Interior", "Department of Agriculture",
+    "Department of Transportation", "General Services Administration", "Environmental Protection Agency",
+    "Department of Veterans Affairs", "Department of Homeland Security", "Department of Commerce",
+]
+STATUSES = ["active", "active", "active", "inactive", "archived"]
+TOPICS = [
+    "renewable energy certificates", "grid modernization", "smart meter deployment", "water utility billing",
+    "load forecasting", "asset management", "outage management", "demand response", "power purchase agreements",
+    "transmission planning", "data warehouse migration", "customer analytics", "predictive maintenance",
+    "cybersecurity assessment", "geospatial mapping", "fleet electrification", "rate case support",
+    "regulatory reporting", "hydropower operations", "natural gas pipeline inspection",
+]
+VOCABULARY = (
+    "the contractor shall provide services support analysis data system reporting implementation management "
+    "requirements project delivery schedule performance quality compliance federal agency program operations "
+    "technical documentation training maintenance software hardware integration security monitoring evaluation "
+    "utility energy electric power water gas generation distribution customer billing meter forecasting model "
+    "analytics dashboard database cloud migration registry certificate tracking transfer retirement account "
+    "contract period option year deliverable milestone invoice proposal evaluation criteria past performance "
+    "pricing labor category staffing key personnel subcontracting small business set aside solicitation"
+).split()
+SKILL_AREAS = [
+    "End-to-End Data Solutions", "Data Visualization & Reporting", "Predictive Analytics", "Prescriptive Analytics",
+    "Data Collection & Ingestion", "Data Storage & Management", "Predictive Modeling", "Digital Transformation",
+    "Portfolio Management", "Regulatory Analytics", "Energy Market Analysis", "Asset Performance Management",
+]
+
+
+def _sentence(rng: random.Random, topic: str) -> str:
+    words = rng.choices(VOCABULARY, k=rng.randint(8, 20))
+    words.insert(rng.randrange(len(words)), topic)
+    return " ".join(words).capitalize() + "."
+
+
+def _description(rng: random.Random, mean_words: int) -> str:
+    topic = rng.choice(TOPICS)
+    # Lognormal lengths: most solicitations are short, a few are very long
+    n_words = max(20, int(rng.lognormvariate(0, 0.75) * mean_words))
+    sentences = []
+    while n_words > 0:
+        sentence = _sentence(rng, topic)
+        sentences.append(sentence)
+        n_words -= sentence.count(" ") + 1
+    return " ".join(sentences)
+
+
+def iter_synthetic_rfps(n: int, seed: int = 0, mean_words: int = 400):
+    """Yield n RFP records shaped like the rows of the Supabase table"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for i in range(n):
+        posting_id = f"SYN{seed:03d}{i:08d}"
+        created_at = start + timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        yield {
+            "id": i + 1,
+            "postingId": posting_id,
+            "title": f"{rng.choice(TOPICS).title()} Services",
+            "description": _description(rng, mean_words),
+            "department": rng.choice(DEPARTMENTS),
+            "status": rng.choice(STATUSES),
+            "created_at": created_at.isoformat(),
+            "contracting_office_address": f"{rng.randint(1, 9999)} Main St, Washington, DC",
+            "primary_poc": f"poc{rng.randint(1, 500)}@agency.gov",
+            "secondary_poc": "",
+            "url": f"https://example.gov/opportunities/{posting_id}",
+            "downloadUrl": "",
+            "generalInfos": "",
+            "hostingUrls": [],
+        }
+
+
+def iter_synthetic_skill_sets(n: int, seed: int = 0):
+    rng = random.Random(seed + 1)
+    for i in range(n):
+        area = SKILL_AREAS[i % len(SKILL_AREAS)]
+        yield {"id": i, "text": f"{area}: {_sentence(rng, rng.choice(TOPICS))}"}
+
+
+def write_jsonl(records, path: str) -> int:
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            count += 1
+    return count
+
+
+def generate_corpus(output_dir: str, n_rfps: int, n_skill_sets: int = 30, seed: int = 0, mean_words: int = 400):
+    """Write data.jsonl and test_skill_sets.jsonl into output_dir and return their paths"""
+    data_path = os.path.join(output_dir, 'data.jsonl')
+    skill_sets_path = os.path.join(output_dir, 'test_skill_sets.jsonl')
+    write_jsonl(iter_synthetic_rfps(n_rfps, seed, mean_words), data_path)
+    write_jsonl(iter_synthetic_skill_sets(n_skill_sets, seed), skill_sets_path)
+    return data_path, skill_sets_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic RFP corpus')
+    parser.add_argument('--output_dir', type=str, default='../../datasets/synthetic',
+                        help='Directory to write data.jsonl and test_skill_sets.jsonl')
+    parser.add_argument('--n_rfps', type=int, default=1000,
+                        help='Number of RFP records (1k to 1M)')
+    parser.add_argument('--n_skill_sets', type=int, default=30,
+                        help='Number of skill sets')
+    parser.add_argument('--mean_words', type=int, default=400,
+                        help='Typical description length in words')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed (the same seed produces the same corpus)')
+    args = parser.parse_args()
+
+    data_path, skill_sets_path = generate_corpus(args.output_dir, args.n_rfps, args.n_skill_sets,
+                                                 args.seed, args.mean_words)
+    print(f"Wrote {args.n_rfps} RFPs to {data_path} and {args.n_skill_sets} skill sets to {skill_sets_path}")
+
+
+if __name__ == "__main__":
+    main()
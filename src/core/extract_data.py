@@ -1,17 +1,34 @@
 import os
 import json
 import argparse
-from supabase import create_client, Client
 from dotenv import load_dotenv
+from utils.supabase_utils import iter_table_rows, projection_columns, load_watermark, save_watermark
+from utils.metrics import add_metrics_arguments, metrics, write_run_metrics
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('--output_path', 
                        type=str, 
                        default='../../datasets/data.jsonl',
                        help='Path to save the output JSONL file')
-    args = parser.parse_args()
-
+    parser.add_argument('--columns',
+                       type=str,
+                       default='*',
+                       help='Comma separated columns to fetch (id and created_at are always included)')
+    parser.add_argument('--page_size',
+                       type=int,
+                       default=1000,
+                       help='Number of rows fetched per request')
+    parser.add_argument('--incremental',
+                       action='store_true',
+                       help='Only fetch rows newer than the saved watermark and append them to the output file')
+    parser.add_argument('--watermark_path',
+                       type=str,
+                       default=None,
+                       help='Path of the watermark file (default: <output_path>.watermark.json)')
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    
     # Load environment variables
     load_dotenv()
     
@@ -19,18 +36,32 @@ def main():
     url = os.environ.get("SUPABASE_URL")
     key = os.environ.get("SUPABASE_KEY")
     
-    # Initialize Supabase client
-    supabase: Client = create_client(url, key)
+    # Initialize Supabase client (imported here: supabase is slow to import)
+    from supabase import create_client
+    supabase = create_client(url, key)
     
-    # Fetch data from Supabase
-    response = supabase.table("data").select("*").execute()
-    data = response.data
+    watermark_path = args.watermark_path or args.output_path + '.watermark.json'
+    created_after = load_watermark(watermark_path) if args.incremental else None
+    newest = created_after
+    count = 0
     
-    # Save data to JSONL file
-    with open(args.output_path, 'w', encoding='utf-8') as f:
-        for record in data:
-            if len(record["description"]) > 0:
+    # Fetch data from Supabase page by page and stream it to the JSONL file
+    with metrics.stage('extract'), open(args.output_path, 'a' if args.incremental else 'w', encoding='utf-8') as f:
+        rows = iter_table_rows(supabase, "data", columns=projection_columns(args.columns),
+                               page_size=args.page_size, created_after=created_after)
+        for record in rows:
+            created_at = record.get("created_at")
+            if created_at and (newest is None or created_at > newest):
+                newest = created_at
+            if len(record.get("description") or "") > 0:
                 f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                count += 1
+    
+    if newest:
+        save_watermark(watermark_path, newest)
+    print(f"Wrote {count} records to {args.output_path}")
+    metrics.increment('records_written', count)
+    write_run_metrics('extract_data', args.metrics_json, args.metrics_prom)
 
 if __name__ == "__main__":
     main()
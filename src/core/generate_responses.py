@@ -6,22 +6,39 @@ Performs similarity matching, scores RFPs, and generates responses for top perfo
 
 import os
 import json
-import pandas as pd
+import asyncio
 import math
 import time
 import argparse
-from typing import List, Dict, Any
-from tqdm import tqdm
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Tuple
 from dotenv import load_dotenv
-from openai import OpenAI
-from pinecone import Pinecone
-
-# Load environment variables
-load_dotenv()
-
-# Initialize clients
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+from utils.utils import embed_with_cache, get_client, iter_jsonl, load_jsonl, max_scores_by_rfp, report_embedding_cache
+from utils.backends import PINECONE_MAX_TOP_K, add_backend_arguments, add_pooling_arguments, index_key, open_index
+from utils.metadata_filter import add_filter_arguments, filter_from_args
+from utils.namespace_config import namespace_dimensions
+from utils.rate_limiter import AsyncRateLimiter
+from utils.metrics import add_metrics_arguments, metrics, write_run_metrics
+from utils.tokenizer import TokenCounts, token_counts_path
+
+# pandas and openai are imported on first use (together ~1 s of startup)
+if TYPE_CHECKING:
+    import pandas as pd
+    from openai import AsyncOpenAI
+
+# OpenAI client, created on first use (the shared client of utils.utils unless replaced, e.g. by the benchmarks)
+openai_client = None
+
+
+def get_openai_client():
+    global openai_client
+    if openai_client is None:
+        openai_client = get_client()
+    return openai_client
+
+# Response generation settings
+RESPONSE_MODEL = "gpt-3.5-turbo"
+RESPONSE_MAX_TOKENS = 2000
+RESPONSE_TEMPERATURE = 0.7
 
 # Response generation template
 RESPONSE_TEMPLATE = """
@@ -81,42 +98,30 @@ Only generate the RFP response.
 """
 
 
-def load_jsonl(file_path: str) -> List[Dict[str, Any]]:
-    """Load data from JSONL file"""
-    data = []
-    with open(file_path, 'r', encoding='utf-8') as file:
-        for line in file:
-            try:
-                data.append(json.loads(line.strip()))
-            except json.JSONDecodeError:
-                continue
-    return data
-
-
-def get_embedding(text: str, model: str = "text-embedding-3-large") -> List[float]:
+def get_embedding(text: str, model: str = "text-embedding-3-large", dimensions: int = None) -> List[float]:
     """Generate embedding using OpenAI API"""
     try:
-        response = openai_client.embeddings.create(input=[text], model=model)
-        return response.data[0].embedding
+        return embed_with_cache([text], model=model, api_client=get_openai_client(), dimensions=dimensions)[0]
     except Exception as e:
         print(f"Error generating embedding: {e}")
         return []
 
 
-def retrieve_top_k_similar_docs(query: str, index, namespace: str, k: int = 100) -> List[Dict]:
-    """Retrieve top-k similar documents from Pinecone"""
+def retrieve_top_k_similar_docs(query: str, index, namespace: str, k: int = 100,
+                                dimensions: int = None) -> List[Dict]:
+    """Retrieve top-k similar documents from Pinecone (dimensions: embedding size of the namespace)"""
     try:
         # Generate embedding for the query
-        query_embedding = get_embedding(query)
+        query_embedding = get_embedding(query, dimensions=dimensions)
         if not query_embedding:
             return []
         
-        # Query Pinecone
+        # Query Pinecone (ids and scores only: the metadata is not used here)
         results = index.query(
             vector=query_embedding,
             top_k=k,
             namespace=namespace,
-            include_metadata=True
+            include_metadata=False
         )
         
         # Extract matches with scores
@@ -134,36 +139,39 @@ def retrieve_top_k_similar_docs(query: str, index, namespace: str, k: int = 100)
 
 
 def calculate_similarity_scores(skill_sets: List[Dict], data: List[Dict], 
-                              index, namespace: str) -> Dict[str, float]:
-    """Calculate similarity scores for all RFPs against skill sets"""
+                              index, namespace: str, pooling: str = 'none',
+                              top_m: int = 3, metadata_filter: Dict = None,
+                              dimensions: int = None) -> Tuple[Dict[str, float], Dict[str, int]]:
+    """
+    Calculate similarity scores for all RFPs against skill sets.
+    Returns the highest score of each RFP and the id of the skill set that produced it.
+    pooling: for chunked namespaces, how chunk scores are pooled into one score per RFP ('max' or 'mean_top_m')
+    metadata_filter: only the RFPs matching this Pinecone metadata filter are scored
+    dimensions: embedding size the namespace was ingested with (None: full size)
+    """
     print("Calculating similarity scores...")
     
-    # Create mapping from index to postingId
-    posting_id_map = {}
-    for idx, item in enumerate(data):
-        posting_id_map[str(idx)] = item.get('postingId', '')
+    # Vector ids are the postingIds of the RFPs
+    posting_ids = {str(item['postingId']) for item in data if item.get('postingId')}
     
-    # Store the highest similarity score for each RFP
-    rfp_scores = {}
+    skill_sets = [skill_set for skill_set in skill_sets if skill_set.get('text', '')]
+    if not skill_sets:
+        return {}, {}
     
-    for skill_set in tqdm(skill_sets, desc="Processing skill sets"):
-        skills = skill_set.get('text', '')
-        if not skills:
-            continue
-            
-        # Get similar documents for this skill set
-        similar_docs = retrieve_top_k_similar_docs(skills, index, namespace, k=len(data))
-        
-        # Update scores with the highest similarity for each RFP
-        for doc in similar_docs:
-            doc_id = str(doc['id'])
-            score = doc['score']
-            posting_id = posting_id_map.get(doc_id, '')
-            
-            if posting_id and (posting_id not in rfp_scores or rfp_scores[posting_id] < score):
-                rfp_scores[posting_id] = score
+    # Embed all skill sets in a single request
+    skill_embeddings = embed_with_cache([skill_set['text'] for skill_set in skill_sets],
+                                        api_client=get_openai_client(), dimensions=dimensions)
+    skill_ids = [skill_set.get('id', i) for i, skill_set in enumerate(skill_sets)]
     
-    return rfp_scores
+    # Pinecone rejects queries above its top_k limit (local indexes score every RFP regardless)
+    from utils.local_index import LocalIndex
+    query_top_k = min(len(data), PINECONE_MAX_TOP_K)
+    if query_top_k < len(data) and not isinstance(index, LocalIndex):
+        print(f"Pinecone returns at most {PINECONE_MAX_TOP_K} matches per query: "
+              f"each skill set scores its top {query_top_k} of {len(data)} RFPs")
+    return max_scores_by_rfp(skill_embeddings, skill_ids, index, namespace, posting_ids,
+                             pooling, top_m, query_top_k=query_top_k, progress=True,
+                             metadata_filter=metadata_filter)
 
 
 def generate_response(description: str, max_retries: int = 3) -> str:
@@ -172,35 +180,112 @@ def generate_response(description: str, max_retries: int = 3) -> str:
         try:
             prompt = RESPONSE_TEMPLATE.format(summary=description)
             
-            completion = openai_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2000,
-                temperature=0.7
-            )
+            with metrics.timer('openai.chat'):
+                completion = get_openai_client().chat.completions.create(
+                    model=RESPONSE_MODEL,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=RESPONSE_MAX_TOKENS,
+                    temperature=RESPONSE_TEMPERATURE
+                )
+            metrics.record_usage('openai.chat', getattr(completion, 'usage', None))
             
             return completion.choices[0].message.content.strip()
             
         except Exception as e:
             print(f"Error generating response (attempt {attempt + 1}): {e}")
             if attempt < max_retries - 1:
+                metrics.increment('openai.chat.retries')
                 time.sleep(2 ** attempt)  # Exponential backoff
             else:
                 return f"Error generating response: {str(e)}"
 
 
-def create_rfp_dataframe(data: List[Dict], scores: Dict[str, float]) -> pd.DataFrame:
-    """Create DataFrame with RFP data and scores"""
+def estimate_request_tokens(description: str, max_tokens: int = RESPONSE_MAX_TOKENS,
+                            token_counts: TokenCounts = None) -> int:
+    """Upper bound of the tokens a completion request counts against the TPM limit"""
+    token_counts = token_counts or TokenCounts()
+    template_tokens = token_counts.get_many([RESPONSE_TEMPLATE])[0]
+    return template_tokens + token_counts.get_many([description])[0] + max_tokens
+
+
+async def generate_response_async(description: str, client: 'AsyncOpenAI', limiter: AsyncRateLimiter,
+                                  max_retries: int = 3, token_counts: TokenCounts = None) -> str:
+    """Async version of generate_response; retries and backoff only delay this task"""
+    prompt = RESPONSE_TEMPLATE.format(summary=description)
+    estimated_tokens = estimate_request_tokens(description, token_counts=token_counts)
+    
+    for attempt in range(max_retries):
+        await limiter.acquire(estimated_tokens)
+        try:
+            with metrics.timer('openai.chat'):
+                completion = await client.chat.completions.create(
+                    model=RESPONSE_MODEL,
+                    messages=[
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=RESPONSE_MAX_TOKENS,
+                    temperature=RESPONSE_TEMPERATURE
+                )
+            metrics.record_usage('openai.chat', getattr(completion, 'usage', None))
+            
+            return completion.choices[0].message.content.strip()
+            
+        except Exception as e:
+            print(f"Error generating response (attempt {attempt + 1}): {e}")
+            if attempt < max_retries - 1:
+                metrics.increment('openai.chat.retries')
+                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+            else:
+                return f"Error generating response: {str(e)}"
+
+
+async def generate_responses_async(descriptions: List[str], concurrency: int,
+                                   requests_per_minute: float, tokens_per_minute: float,
+                                   token_counts: TokenCounts = None, client: 'AsyncOpenAI' = None) -> List[str]:
+    """
+    Generate responses concurrently, bounded by a worker limit and a token-bucket rate limiter.
+    client: async OpenAI client to use (e.g. a fake one for benchmarks), a new one is created by default
+    """
+    if client is None:
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL") or None)
+    limiter = AsyncRateLimiter(requests_per_minute, tokens_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+    from tqdm import tqdm
+    progress = tqdm(total=len(descriptions), desc="Generating responses")
+    
+    async def run(description):
+        if description and isinstance(description, str) and description.strip():
+            async with semaphore:
+                response = await generate_response_async(description, client, limiter,
+                                                         token_counts=token_counts)
+        else:
+            response = "No valid description available for response generation."
+        progress.update(1)
+        return response
+    
+    try:
+        return await asyncio.gather(*(run(description) for description in descriptions))
+    finally:
+        progress.close()
+        await client.close()
+
+
+def create_rfp_dataframe(data: Iterable[Dict], scores: Dict[str, float],
+                        best_skill_sets: Dict[str, int] = None) -> 'pd.DataFrame':
+    """Create DataFrame with RFP data and scores (data may be a stream of records)"""
+    best_skill_sets = best_skill_sets or {}
     rfp_records = []
     
     for item in data:
         posting_id = item.get('postingId', '')
-        score = scores.get(posting_id, 0.0)
+        score = scores.get(str(posting_id), 0.0)
         
         record = {
             'score': score,
+            'best_skill_set': best_skill_sets.get(str(posting_id), ''),
             'contracting_office_address': item.get('contracting_office_address', ''),
             'created_at': item.get('created_at', ''),
             'department': item.get('department', ''),
@@ -219,10 +304,11 @@ def create_rfp_dataframe(data: List[Dict], scores: Dict[str, float]) -> pd.DataF
         }
         rfp_records.append(record)
     
+    import pandas as pd
     return pd.DataFrame(rfp_records)
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description='Generate responses for top-scoring RFPs')
     parser.add_argument('--data_path', default='../../datasets/data.jsonl',
                         help='Path to RFP data file')
@@ -232,67 +318,123 @@ def main():
                         help='Name of the Pinecone index')
     parser.add_argument('--namespace', default='openai-no-chunk',
                         help='Namespace within the Pinecone index')
+    add_backend_arguments(parser)
+    add_pooling_arguments(parser)
+    add_filter_arguments(parser)
     parser.add_argument('--output_csv', default='../../results/rfp_responses.csv',
                         help='Path to output CSV file')
     parser.add_argument('--top_percentage', type=float, default=0.1,
-                        help='Percentage of top RFPs to generate responses for (default: 0.1 for 10%)')
+                        help='Percentage of top RFPs to generate responses for (default: 0.1 for 10%%)')
     parser.add_argument('--delay', type=float, default=3.0,
                         help='Delay between API calls in seconds (default: 3.0)')
+    parser.add_argument('--async_generation', action='store_true',
+                        help='Generate responses concurrently with a token-bucket rate limiter instead of a fixed delay')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='Maximum number of in-flight requests in async mode (default: 8)')
+    parser.add_argument('--rpm', type=float, default=500,
+                        help='Requests per minute limit in async mode (default: 500)')
+    parser.add_argument('--tpm', type=float, default=200000,
+                        help='Tokens per minute limit in async mode (default: 200000)')
+    add_metrics_arguments(parser)
+    
+    args = parser.parse_args(argv)
+    
+    # Load environment variables
+    load_dotenv()
     
-    args = parser.parse_args()
+    # Only the RFPs matching the filters are scored and written to the CSV
+    metadata_filter = filter_from_args(args)
+    if metadata_filter:
+        print(f"Metadata filter: {metadata_filter}")
     
     # Load data
+    # Only the postingIds are needed for scoring; the full records are streamed again when building the CSV
     print(f"Loading RFP data from {args.data_path}...")
-    data = load_jsonl(args.data_path)
-    print(f"Loaded {len(data)} RFP records")
-    
-    print(f"Loading skill sets from {args.skill_sets_path}...")
-    skill_sets = load_jsonl(args.skill_sets_path)
+    with metrics.stage('load_data'):
+        # The postingIds come from the record index, the dataset itself is only parsed when building the CSV
+        from utils.record_store import RecordStore
+        store = RecordStore(args.data_path)
+        data = [{'postingId': posting_id} for posting_id in store.ids]
+        print(f"Loaded {len(data)} RFP records")
+        
+        print(f"Loading skill sets from {args.skill_sets_path}...")
+        skill_sets = load_jsonl(args.skill_sets_path)
     print(f"Loaded {len(skill_sets)} skill sets")
     
-    # Connect to Pinecone
-    print(f"Connecting to Pinecone index: {args.index_name}")
-    index = pc.Index(args.index_name)
+    # Connect to Pinecone (or open the local index)
+    print(f"Connecting to {args.backend} index: {args.index_name}")
+    index = open_index(args.backend, args.index_name, args.local_index_dir,
+                       args.quantization, args.rescore_factor)
+    
+    # Skill sets are embedded with the dimensions the namespace was ingested with
+    dimensions = namespace_dimensions(index_key(args.backend, args.index_name, args.local_index_dir), args.namespace)
     
     # Calculate similarity scores
-    scores = calculate_similarity_scores(skill_sets, data, index, args.namespace)
+    with metrics.stage('similarity_scores'):
+        scores, best_skill_sets = calculate_similarity_scores(skill_sets, data, index, args.namespace,
+                                                              pooling=args.pooling, top_m=args.top_m,
+                                                              metadata_filter=metadata_filter,
+                                                              dimensions=dimensions)
     print(f"Calculated scores for {len(scores)} RFPs")
+    # Failing queries raise when none succeeded, so an empty result here means no RFP passed the filters.
+    # Without filters the CSV is still written, every RFP with a score of 0.0
+    if not scores and metadata_filter:
+        print("No RFP matches the metadata filters, nothing to write")
+        report_embedding_cache()
+        write_run_metrics('generate_responses', args.metrics_json, args.metrics_prom)
+        return
     
     # Create DataFrame and sort by scores
     print("Creating DataFrame and sorting by scores...")
-    df = create_rfp_dataframe(data, scores)
-    df = df.sort_values(by='score', ascending=False)
+    with metrics.stage('dataframe'):
+        # With a filter, only the records of the scored RFPs are read from the dataset
+        records = store.get_many(list(scores)).values() if metadata_filter else iter_jsonl(args.data_path)
+        df = create_rfp_dataframe(records, scores, best_skill_sets)
+        df = df.sort_values(by='score', ascending=False)
     
     # Calculate number of RFPs for response generation
     top_count = math.ceil(len(df) * args.top_percentage)
     print(f"Generating responses for top {top_count} RFPs ({args.top_percentage*100:.1f}%)")
     
     # Generate responses for top percentage
-    for idx in tqdm(range(top_count), desc="Generating responses"):
-        description = df.iloc[idx]['description']
-        posting_id = df.iloc[idx]['postingId']
-        score = df.iloc[idx]['score']
+    with metrics.stage('generation'):
+        if args.async_generation:
+            descriptions = df['description'].iloc[:top_count].tolist()
+            # Token counts persisted next to the dataset (written by ingest) are reused for prompt budgeting
+            token_counts = TokenCounts(token_counts_path(args.data_path))
+            responses = asyncio.run(generate_responses_async(descriptions, args.concurrency, args.rpm, args.tpm,
+                                                             token_counts=token_counts))
+            token_counts.save()
+            df.loc[df.index[:top_count], 'response'] = responses
+        else:
+            from tqdm import tqdm
+            for idx in tqdm(range(top_count), desc="Generating responses"):
+                description = df.iloc[idx]['description']
+                posting_id = df.iloc[idx]['postingId']
+                score = df.iloc[idx]['score']
         
-        print(f"Generating response for RFP {posting_id} (score: {score:.4f})...")
+                print(f"Generating response for RFP {posting_id} (score: {score:.4f})...")
         
-        if description and isinstance(description, str) and description.strip():
-            response = generate_response(description)
-            df.at[df.index[idx], 'response'] = response
-        else:
-            df.at[df.index[idx], 'response'] = "No valid description available for response generation."
+                if description and isinstance(description, str) and description.strip():
+                    response = generate_response(description)
+                    df.at[df.index[idx], 'response'] = response
+                else:
+                    df.at[df.index[idx], 'response'] = "No valid description available for response generation."
         
-        # Add delay between API calls to avoid rate limits
-        if idx < top_count - 1:
-            time.sleep(args.delay)
+                # Add delay between API calls to avoid rate limits
+                if idx < top_count - 1:
+                    time.sleep(args.delay)
     
     # Save to CSV
     print(f"Saving results to {args.output_csv}...")
-    df.to_csv(args.output_csv, index=False)
+    with metrics.stage('write_csv'):
+        df.to_csv(args.output_csv, index=False)
     
     print(f"\nCompleted!")
     print(f"Total RFPs processed: {len(df)}")
     print(f"Responses generated: {top_count}")
     print(f"Results saved to: {args.output_csv}")
+    report_embedding_cache()
     
     # Print summary statistics
     print(f"\nScore Statistics:")
@@ -306,6 +448,7 @@ def main():
     top_5 = df.head(5)[['postingId', 'score', 'title']].copy()
     top_5['title'] = top_5['title'].str[:50] + '...'  # Truncate for display
     print(top_5.to_string(index=False))
+    write_run_metrics('generate_responses', args.metrics_json, args.metrics_prom)
 
 
 if __name__ == "__main__":
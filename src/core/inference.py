@@ -1,38 +1,54 @@
-from utils.utils import load_jsonl, retrieve_top_k_similar_docs
+from utils.utils import load_jsonl, get_embeddings_batch, query_top_k_similar_docs, report_embedding_cache
 from dotenv import load_dotenv
 import os
-from openai import OpenAI
-from pinecone import Pinecone
-import json
-from tqdm import tqdm
+from utils.backends import add_backend_arguments, add_pooling_arguments, index_key, open_index
+from utils.match_results import RESULT_FORMATS, MatchResultWriter
+from utils.metadata_filter import add_filter_arguments, filter_from_args
+from utils.namespace_config import namespace_dimensions
+from concurrent.futures import ThreadPoolExecutor
 import argparse
+from utils.metrics import add_metrics_arguments, metrics, write_run_metrics
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='RFP Matching Script')
-    
+
     # Pinecone parameters
     parser.add_argument('--namespace', type=str, default='openai-no-chunk',
                       help='Namespace within Pinecone index')
     parser.add_argument('--index_name', type=str, default='rfp',
                       help='Name of the Pinecone index')
-    
+    add_backend_arguments(parser)
+    add_pooling_arguments(parser)
+
+    # Metadata filters, applied by the index before scoring
+    add_filter_arguments(parser)
+
     # Input file paths
     parser.add_argument('--data_path', type=str, default='../../datasets/utility_rfps.jsonl',
                       help='Path to the RFP data file')
     parser.add_argument('--skill_sets_path', type=str, default='../../datasets/test_skill_sets.jsonl',
                       help='Path to the skill sets file')
-    
+
     # Output file paths
+    parser.add_argument('--output_results', type=str, default='../../results/match_results.jsonl',
+                      help='Path to save the structured results (skill set, rank, postingId, score)')
+    parser.add_argument('--output_format', type=str, choices=RESULT_FORMATS, default=None,
+                      help='Format of --output_results (default: parquet for a .parquet path, else jsonl)')
     parser.add_argument('--output_matched_docs', type=str, default='../../results/utest_matched_docs.txt',
                       help='Path to save matched documents')
     parser.add_argument('--output_match_scores', type=str, default='../../results/utest_matchescores.txt',
                       help='Path to save matching scores')
-    
+
     # Additional parameters
     parser.add_argument('--top_k', type=int, default=3,
                       help='Number of top matches to retrieve')
-    
-    return parser.parse_args()
+    parser.add_argument('--workers', type=int, default=8,
+                      help='Number of vector queries run in parallel')
+    parser.add_argument('--embed_batch_size', type=int, default=100,
+                      help='Number of skill sets embedded per request')
+    add_metrics_arguments(parser)
+
+    return parser.parse_args(argv)
 
 def ensure_directory(file_path):
     """Create directory if it doesn't exist"""
@@ -40,80 +56,130 @@ def ensure_directory(file_path):
     if directory and not os.path.exists(directory):
         os.makedirs(directory)
 
-def main():
+def embed_skill_sets(texts, dimensions, batch_size, executor):
+    """
+    Embed the skill sets in batches (one request per batch, batches sent concurrently).
+    dimensions: embedding size the namespace was ingested with (None: full size)
+    """
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    embeddings = []
+    for batch_embeddings in executor.map(lambda batch: get_embeddings_batch(batch, dimensions=dimensions), batches):
+        embeddings.extend(batch_embeddings)
+    return embeddings
+
+def match_skill_sets(embeddings, index, args, executor, metadata_filter=None):
+    """
+    Top k matches of every embedded skill set, queried in parallel; results keep the skill set order.
+    Only the RFPs matching metadata_filter are candidates.
+    """
+    from tqdm import tqdm
+
+    def query(embedding):
+        return query_top_k_similar_docs(embedding, index, args.namespace, k=args.top_k,
+                                        pooling=args.pooling, top_m=args.top_m, metadata_filter=metadata_filter)
+    return list(tqdm(executor.map(query, embeddings), total=len(embeddings), desc="Matching skill sets"))
+
+def result_rows(skill_sets, matches_per_skill_set):
+    """Flatten the matches into one row per (skill set, rank)"""
+    for idx, (skill_set, matches) in enumerate(zip(skill_sets, matches_per_skill_set), start=1):
+        for rank, match in enumerate(matches, start=1):
+            yield {
+                'skill_set_id': skill_set.get('id', idx),
+                'skill_set_index': idx,
+                'rank': rank,
+                'postingId': str(match['id']),  # vector ids are postingIds
+                'score': float(match['score']),
+            }
+
+def render_reports(skill_sets, rows, store, top_k, matched_docs_path, match_scores_path):
+    """Write the two text reports from the structured rows (the files are replaced, not appended to)"""
+    # Only the descriptions of the matched RFPs are read from the dataset
+    data = store.get_many({row['postingId'] for row in rows}, fields=['description'])
+    rows_by_skill_set = {}
+    for row in rows:
+        rows_by_skill_set.setdefault(row['skill_set_index'], []).append(row)
+
+    with open(matched_docs_path, 'w') as docs_file, open(match_scores_path, 'w') as scores_file:
+        for idx, skill_set in enumerate(skill_sets, start=1):
+            skills = skill_set['text']
+            header = f"{idx}. Skill Set: {skills}\nTop {top_k} Matched Documents:\n"
+            docs_file.write(header)
+            scores_file.write(header)
+
+            for row in sorted(rows_by_skill_set.get(idx, []), key=lambda row: row['rank']):
+                posting_id = row['postingId']
+                description = data.get(posting_id, {}).get('description', '')
+
+                # Detailed matching results
+                docs_file.write(f"{idx}-{row['rank']}. Posting ID: {posting_id}\n")
+                docs_file.write(f"Similarity: {row['score']:.4f}\n")
+                docs_file.write(f"Description: {description}\n\n")
+
+                # Summary of matching scores
+                scores_file.write(f"{idx}-{row['rank']}. Posting ID: {posting_id}\n")
+                scores_file.write(f"Similarity: {row['score']:.4f}\n\n")
+
+            docs_file.write("-" * 100 + "\n\n")
+            scores_file.write("-" * 100 + "\n\n")
+
+def main(argv=None):
     # Load environment variables
     load_dotenv()
-    
+
     # Parse command line arguments
-    args = parse_args()
-    
+    args = parse_args(argv)
+
     # API Configuration
     OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-    PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
-    
-    if not OPENAI_API_KEY or not PINECONE_API_KEY:
+
+    if not OPENAI_API_KEY:
         raise ValueError("Missing required API keys in environment variables")
-    
-    # Initialize OpenAI client for embedding generation
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    
-    # Initialize Pinecone client for vector search
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    index = pc.Index(args.index_name)
-    
+
+    metadata_filter = filter_from_args(args)
+    if metadata_filter:
+        print(f"Metadata filter: {metadata_filter}")
+
+    # Open the vector search backend (Pinecone index or local memory-mapped index)
+    index = open_index(args.backend, args.index_name, args.local_index_dir,
+                       args.quantization, args.rescore_factor)
+
     try:
-        # Load data and skill sets
-        data = load_jsonl(args.data_path)
-        skill_sets = load_jsonl(args.skill_sets_path)
-        
-        # Ensure output directories exist
-        ensure_directory(args.output_matched_docs)
-        ensure_directory(args.output_match_scores)
-        
-        # Process each skill set and find matching RFPs
-        for idx, skill_set in enumerate(tqdm(skill_sets), start=1):
-            # Get skills text
-            skills = skill_set['text']
-            
-            # Retrieve top k similar documents using vector similarity search
-            retrieved_docs = retrieve_top_k_similar_docs(
-                skills, 
-                index, 
-                args.namespace, 
-                k=args.top_k
-            )
-            
-            # Save detailed matching results
-            with open(args.output_matched_docs, 'a') as f:
-                f.write(f"{idx}. Skill Set: {skills}\nTop {args.top_k} Matched Documents:\n")
-                
-                for i, retrieved_doc in enumerate(retrieved_docs, start=1):
-                    similarity_score = retrieved_doc['score']
-                    posting_id = data[int(retrieved_doc['id'])]['postingId']
-                    description = data[int(retrieved_doc['id'])]['description']
-                    
-                    f.write(f"{idx}-{i}. Posting ID: {posting_id}\n")
-                    f.write(f"Similarity: {similarity_score:.4f}\n")
-                    f.write(f"Description: {description}\n\n")
-                    
-                f.write("-" * 100 + "\n\n")
-            
-            # Save summary of matching scores
-            with open(args.output_match_scores, 'a') as f:
-                f.write(f"{idx}. Skill Set: {skills}\nTop {args.top_k} Matched Documents:\n")
-                
-                for i, retrieved_doc in enumerate(retrieved_docs, start=1):
-                    similarity_score = retrieved_doc['score']
-                    posting_id = data[int(retrieved_doc['id'])]['postingId']
-                    
-                    f.write(f"{idx}-{i}. Posting ID: {posting_id}\n")
-                    f.write(f"Similarity: {similarity_score:.4f}\n\n")
-                    
-                f.write("-" * 100 + "\n\n")
-                
+        # Load skill sets and the record index of the data
+        # Vector ids are postingIds, so matches are looked up by postingId
+        with metrics.stage('load_data'):
+            from utils.record_store import RecordStore
+            store = RecordStore(args.data_path)
+            skill_sets = load_jsonl(args.skill_sets_path)
+
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            # Embed all skill sets up front, then run the vector queries in parallel
+            with metrics.stage('embed'):
+                # Queries are embedded with the dimensions the namespace was ingested with
+                dimensions = namespace_dimensions(index_key(args.backend, args.index_name, args.local_index_dir),
+                                                  args.namespace)
+                embeddings = embed_skill_sets([skill_set['text'] for skill_set in skill_sets], dimensions,
+                                              args.embed_batch_size, executor)
+
+            with metrics.stage('match'):
+                matches_per_skill_set = match_skill_sets(embeddings, index, args, executor, metadata_filter)
+
+        with metrics.stage('write_results'):
+            rows = list(result_rows(skill_sets, matches_per_skill_set))
+            with MatchResultWriter(args.output_results, args.output_format) as writer:
+                writer.write(rows)
+
+            # The text reports are rendered from the same rows
+            ensure_directory(args.output_matched_docs)
+            ensure_directory(args.output_match_scores)
+            render_reports(skill_sets, rows, store, args.top_k, args.output_matched_docs, args.output_match_scores)
+        print(f"Saved {len(rows)} matches of {len(skill_sets)} skill sets to {args.output_results}")
+
+        report_embedding_cache()
+        write_run_metrics('inference', args.metrics_json, args.metrics_prom)
+
     except Exception as e:
         print(f"An error occurred: {str(e)}")
         raise
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
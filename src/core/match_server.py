@@ -0,0 +1,290 @@
+"""
+Resident matching service: loads the RFP metadata, opens the vector index and the API clients once,
+then answers matching requests over HTTP without paying process startup and warm-up per query.
+
+POST /match  {"text": "...", "top_k": 3}            -> top k RFPs of one skill text, with their metadata
+POST /score  {"skill_sets": [{"id": 1, "text": "..."}], "top_n": 100}
+                                                    -> highest score of every RFP over the skill sets
+Both accept a Pinecone metadata filter, e.g. "filter": {"status": {"$in": ["active"]}} (see utils.metadata_filter).
+GET  /health, GET /metrics (Prometheus text format)
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from utils.backends import PINECONE_MAX_TOP_K, add_backend_arguments, add_pooling_arguments, index_key, open_index
+from utils.embedding_cache import MemoryEmbeddingCache, get_default_cache
+from utils.local_index import LocalIndex
+from utils.metrics import add_metrics_arguments, metrics, write_run_metrics
+from utils.namespace_config import namespace_dimensions
+from utils.tokenizer import MAX_EMBEDDING_TOKENS, truncate_texts
+from utils.utils import iter_jsonl, max_scores_by_rfp, query_top_k_similar_docs
+
+DEFAULT_METADATA_FIELDS = 'postingId,title,department,status,created_at,url'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Resident RFP matching server')
+
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=8200, help='Port to listen on')
+
+    # Index parameters
+    parser.add_argument('--namespace', type=str, default='openai-no-chunk',
+                        help='Default namespace (requests may pass their own)')
+    parser.add_argument('--index_name', type=str, default='rfp', help='Name of the Pinecone index')
+    add_backend_arguments(parser)
+    add_pooling_arguments(parser)
+
+    # RFP metadata held in memory
+    parser.add_argument('--data_path', type=str, default='../../datasets/utility_rfps.jsonl',
+                        help='Path to the RFP data file')
+    parser.add_argument('--metadata_fields', type=str, default=DEFAULT_METADATA_FIELDS,
+                        help='Comma separated RFP fields returned with the matches')
+
+    # Caching and connection pools
+    parser.add_argument('--embedding_model', type=str, default='text-embedding-3-large',
+                        help='Model of the query embeddings')
+    parser.add_argument('--query_cache_size', type=int, default=10000,
+                        help='Number of query embeddings kept in the in-memory LRU cache')
+    parser.add_argument('--max_connections', type=int, default=32,
+                        help='Size of the pooled HTTP connections to the embedding API')
+    parser.add_argument('--index_workers', type=int, default=8,
+                        help='Threads running index queries (the Pinecone client pools its connections per thread)')
+    parser.add_argument('--top_k', type=int, default=3, help='Default number of matches of /match')
+    add_metrics_arguments(parser)
+
+    return parser.parse_args(argv)
+
+
+POOLING_MODES = ('none', 'max', 'mean_top_m')
+
+
+async def read_body(request) -> dict:
+    """JSON object of a request; a malformed body is the client's error (400), not the server's"""
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(reason="Request body is not valid JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="Request body must be a JSON object")
+    return body
+
+
+def int_field(body: dict, name: str, default, maximum: int = None):
+    """Positive integer field of a request body (default when absent)"""
+    value = body.get(name)
+    if value is None:
+        return default
+    # bool is an int subclass, and int() would silently truncate floats
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise web.HTTPBadRequest(reason=f"'{name}' must be a positive integer")
+    try:
+        value = int(value)
+    except ValueError:
+        raise web.HTTPBadRequest(reason=f"'{name}' must be a positive integer")
+    if value < 1 or (maximum is not None and value > maximum):
+        raise web.HTTPBadRequest(reason=f"'{name}' must be between 1 and {maximum}" if maximum
+                                 else f"'{name}' must be a positive integer")
+    return value
+
+
+def query_options(body: dict, args) -> dict:
+    """Namespace, pooling, top_m and filter of a request, checked before any API call"""
+    namespace = body.get('namespace', args.namespace)
+    if not isinstance(namespace, str):
+        raise web.HTTPBadRequest(reason="'namespace' must be a string")
+    pooling = body.get('pooling', args.pooling)
+    if pooling not in POOLING_MODES:
+        raise web.HTTPBadRequest(reason=f"'pooling' must be one of {', '.join(POOLING_MODES)}")
+    metadata_filter = body.get('filter')
+    if metadata_filter is not None and not isinstance(metadata_filter, dict):
+        raise web.HTTPBadRequest(reason="'filter' must be a Pinecone metadata filter object")
+    return {'namespace': namespace, 'pooling': pooling, 'top_m': int_field(body, 'top_m', args.top_m),
+            'metadata_filter': metadata_filter}
+
+
+class MatchService:
+    """State shared by all requests: RFP metadata, index, pooled API client and query embedding caches"""
+
+    def __init__(self, args):
+        self.args = args
+        self.fields = [field.strip() for field in args.metadata_fields.split(',') if field.strip()]
+        self.records = {}
+        self.index = None
+        self.client = None
+        self.executor = ThreadPoolExecutor(max_workers=args.index_workers)
+        self.query_cache = MemoryEmbeddingCache(args.query_cache_size)
+        self.disk_cache = get_default_cache()
+
+    def load(self):
+        """Load the RFP metadata and open the index; local namespaces are warmed so the first query is fast"""
+        with metrics.stage('load_data'):
+            # Vector ids are postingIds, so records are looked up by postingId
+            for record in iter_jsonl(self.args.data_path, fields=self.fields):
+                if record.get('postingId'):
+                    self.records[str(record['postingId'])] = record
+        print(f"Loaded {len(self.records)} RFPs from {self.args.data_path}")
+
+        with metrics.stage('open_index'):
+            self.index = open_index(self.args.backend, self.args.index_name, self.args.local_index_dir,
+                                    self.args.quantization, self.args.rescore_factor)
+            if isinstance(self.index, LocalIndex):
+                # Map the vectors (and build the int8 copy / chunk groups) now rather than on the first request
+                local_namespace = self.index.namespace(self.args.namespace)
+                _ = local_namespace.search_matrix
+                if self.args.pooling != 'none':
+                    _ = local_namespace.parent_groups
+
+        import httpx
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        limits = httpx.Limits(max_connections=self.args.max_connections,
+                              max_keepalive_connections=self.args.max_connections)
+        self.client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY"),
+                                  base_url=os.environ.get("OPENAI_BASE_URL") or None,
+                                  http_client=DefaultAsyncHttpxClient(limits=limits))
+
+    async def embed(self, texts: list, namespace: str) -> list:
+        """Query embeddings: in-memory LRU first, then the on-disk cache, then one API request for the rest"""
+        texts = truncate_texts(texts, MAX_EMBEDDING_TOKENS)
+        dimensions = namespace_dimensions(index_key(self.args.backend, self.args.index_name, self.args.local_index_dir),
+                                          namespace)
+        # Same cache keys as utils.embed_with_cache, so the batch scripts and the server share the disk cache
+        cache_model = f"{self.args.embedding_model}@{dimensions}" if dimensions else self.args.embedding_model
+        embeddings = [self.query_cache.get(cache_model, text) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        # SQLite calls block (and may evict), so the disk cache is read and written on the worker threads
+        if missing and self.disk_cache is not None:
+            cached = await self.run_in_executor(self.disk_cache.get_many, cache_model, [texts[i] for i in missing])
+            for i, embedding in zip(missing, cached):
+                embeddings[i] = embedding
+            missing = [i for i in missing if embeddings[i] is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            kwargs = {'dimensions': dimensions} if dimensions else {}
+            with metrics.timer('openai.embeddings'):
+                response = await self.client.embeddings.create(input=missing_texts, model=self.args.embedding_model,
+                                                               **kwargs)
+            metrics.record_usage('openai.embeddings', response.usage)
+            new_embeddings = [item.embedding for item in response.data]
+            if self.disk_cache is not None:
+                await self.run_in_executor(self.disk_cache.put_many, cache_model, missing_texts, new_embeddings)
+            for i, embedding in zip(missing, new_embeddings):
+                embeddings[i] = embedding
+        for text, embedding in zip(texts, embeddings):
+            self.query_cache.put(cache_model, text, embedding)
+        return embeddings
+
+    async def run_in_executor(self, fn, *args, **kwargs):
+        """Index and disk cache calls are blocking (numpy, SQLite or the Pinecone HTTP client), so they run on the worker threads"""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(fn, *args, **kwargs))
+
+    def rfp(self, posting_id: str) -> dict:
+        return self.records.get(posting_id, {'postingId': posting_id})
+
+    async def match(self, request):
+        start = time.perf_counter()
+        body = await read_body(request)
+        text = body.get('text')
+        if not text or not isinstance(text, str):
+            raise web.HTTPBadRequest(reason="'text' is required")
+        options = query_options(body, self.args)
+        # Pinecone rejects a top_k above its limit
+        top_k = int_field(body, 'top_k', self.args.top_k, maximum=PINECONE_MAX_TOP_K)
+
+        with metrics.timer('match_server.match'):
+            embedding = (await self.embed([text], options['namespace']))[0]
+            with metrics.timer('index.query'):
+                matches = await self.run_in_executor(query_top_k_similar_docs, embedding, self.index,
+                                                     options['namespace'], k=top_k, pooling=options['pooling'],
+                                                     top_m=options['top_m'], metadata_filter=options['metadata_filter'])
+        return web.json_response({
+            'matches': [{'id': match['id'], 'score': match['score'], 'rfp': self.rfp(str(match['id']))}
+                        for match in matches],
+            'took_ms': round((time.perf_counter() - start) * 1000, 2),
+        })
+
+    async def score(self, request):
+        start = time.perf_counter()
+        body = await read_body(request)
+        skill_sets = body.get('skill_sets')
+        if not isinstance(skill_sets, list) or not all(isinstance(skill_set, dict) for skill_set in skill_sets):
+            raise web.HTTPBadRequest(reason="'skill_sets' must be a list of {'text': ...} objects")
+        skill_sets = [skill_set for skill_set in skill_sets if skill_set.get('text')]
+        if not skill_sets or not all(isinstance(skill_set['text'], str) for skill_set in skill_sets):
+            raise web.HTTPBadRequest(reason="'skill_sets' must hold at least one {'text': ...}")
+        options = query_options(body, self.args)
+        namespace = options['namespace']
+        top_n = int_field(body, 'top_n', None)
+
+        with metrics.timer('match_server.score'):
+            skill_embeddings = await self.embed([skill_set['text'] for skill_set in skill_sets], namespace)
+            skill_ids = [skill_set.get('id', i) for i, skill_set in enumerate(skill_sets)]
+            with metrics.timer('index.score'):
+                try:
+                    # Pinecone rejects a top_k above its limit; a failed query fails the request
+                    # instead of returning partial scores
+                    rfp_scores, rfp_best_skill = await self.run_in_executor(
+                        max_scores_by_rfp, skill_embeddings, skill_ids, self.index, namespace, set(self.records),
+                        options['pooling'], options['top_m'],
+                        query_top_k=min(len(self.records), PINECONE_MAX_TOP_K),
+                        metadata_filter=options['metadata_filter'], skip_errors=False)
+                except Exception as e:
+                    raise web.HTTPBadGateway(text=f"Index query failed: {e}")
+        ranked = sorted(rfp_scores, key=rfp_scores.get, reverse=True)
+        if top_n is not None:
+            ranked = ranked[:top_n]
+        return web.json_response({
+            'scores': [{'postingId': posting_id, 'score': rfp_scores[posting_id],
+                        'skill_set_id': rfp_best_skill[posting_id]} for posting_id in ranked],
+            'took_ms': round((time.perf_counter() - start) * 1000, 2),
+        })
+
+    async def health(self, request):
+        return web.json_response({'status': 'ok', 'rfps': len(self.records),
+                                  'query_cache': {'entries': len(self.query_cache), 'hits': self.query_cache.hits,
+                                                  'misses': self.query_cache.misses}})
+
+    async def prometheus(self, request):
+        return web.Response(text=metrics.to_prometheus('match_server'), content_type='text/plain')
+
+    async def close(self, app):
+        await self.client.close()
+        self.executor.shutdown(wait=False)
+        metrics.increment('query_cache.hits', self.query_cache.hits)
+        metrics.increment('query_cache.misses', self.query_cache.misses)
+        write_run_metrics('match_server', self.args.metrics_json, self.args.metrics_prom)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/match', self.match)
+        app.router.add_post('/score', self.score)
+        app.router.add_get('/health', self.health)
+        app.router.add_get('/metrics', self.prometheus)
+        app.on_cleanup.append(self.close)
+        return app
+
+
+def main(argv=None):
+    # Load environment variables
+    load_dotenv()
+
+    args = parse_args(argv)
+    if not os.environ.get("OPENAI_API_KEY"):
+        raise ValueError("Missing OPENAI_API_KEY in environment variables")
+
+    service = MatchService(args)
+    service.load()
+    print(f"Matching server on http://{args.host}:{args.port} (namespace: {args.namespace}, backend: {args.backend})")
+    web.run_app(service.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Single entry point of the workflow scripts:
+
+    python rfp.py <command> [arguments]
+
+Commands run the main() of the corresponding script with the remaining arguments, so `rfp.py ingest --help`
+shows the options of store_pinecone.py. Only the selected script is imported, and the scripts import their heavy
+dependencies (openai, pandas, matplotlib, supabase, pinecone) when they first use them, so quick commands
+and cron jobs do not pay for unused libraries. Relative default paths resolve against the working directory
+as for the scripts (run it from src/core).
+"""
+import importlib
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# The scripts live in src/core and src/analysis and import from src/utils
+for directory in ('', 'core', 'analysis'):
+    path = os.path.abspath(os.path.join(SRC_DIR, directory))
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# command -> (module, summary)
+COMMANDS = {
+    'extract': ('extract_data', 'Extract the RFPs from Supabase into a JSONL file'),
+    'filter': ('utility_data', 'Keep the utility industry RFPs (LLM classifier)'),
+    'ingest': ('store_pinecone', 'Embed the RFPs into Pinecone or the local index'),
+    'match': ('inference', 'Top k RFPs of every skill set'),
+    'generate': ('generate_responses', 'Score all RFPs and generate responses for the best ones'),
+    'analyze': ('similarity_score_distribution', 'Similarity score distributions per skill set'),
+    'evaluate': ('compare_sim_score', 'Golden-set retrieval evaluation (recall@k, MRR, latency)'),
+    'serve': ('match_server', 'Resident HTTP matching server'),
+    'snapshot': ('snapshot', 'Export a namespace to local files, or import a snapshot'),
+}
+
+
+def usage() -> str:
+    lines = ['usage: rfp <command> [arguments]', '', 'commands:']
+    lines += [f"  {command:<10} {summary}" for command, (_, summary) in COMMANDS.items()]
+    lines += ['', "Run 'rfp <command> --help' for the arguments of a command."]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0 if argv else 2
+    command, arguments = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"rfp: unknown command '{command}'\n\n{usage()}", file=sys.stderr)
+        return 2
+
+    module = importlib.import_module(COMMANDS[command][0])
+    # argparse names the program after argv[0]: usage lines read "rfp ingest ..."
+    sys.argv = [f"rfp {command}"] + arguments
+    result = module.main(arguments)
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
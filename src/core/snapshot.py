@@ -0,0 +1,285 @@
+"""
+Snapshot of an index namespace (Pinecone or local index) to local files, and restore of a snapshot into a namespace,
+without any embedding request:
+
+    python snapshot.py export --index_name rfp --namespace openai-no-chunk --snapshot_dir ../../datasets/snapshots/rfp
+    python snapshot.py import --index_name rfp-v2 --namespace openai-no-chunk --snapshot_dir ../../datasets/snapshots/rfp
+
+A snapshot directory holds:
+    vectors.npy        (rows, dimension) float32 matrix
+    ids.json           vector id of each row
+    metadata.parquet   metadata of each row: 'vector_id' plus one column per metadata field
+    snapshot.json      source index and namespace, dimension, row count, embedding dimensions of the namespace
+    manifest.json      ingest manifest of the namespace, if any, so incremental ingest continues after a restore
+"""
+import argparse
+import json
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+from dotenv import load_dotenv
+from tqdm import tqdm
+
+from utils.backends import add_backend_arguments, index_key_of, open_index
+from utils.local_index import LocalIndex
+from utils.manifest import default_manifest_path
+from utils.metrics import add_metrics_arguments, metrics, write_run_metrics
+from utils.namespace_config import namespace_dimensions, set_namespace_dimensions
+
+SNAPSHOT_VERSION = 1
+# Largest page Pinecone's list returns
+LIST_PAGE_SIZE = 100
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Snapshots store their metadata as Parquet and need pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def _bounded_map(executor, function, items, workers: int):
+    """executor.map that only submits `workers` * 2 tasks ahead of the consumer; results come in order"""
+    items = iter(items)
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= workers * 2:
+            break
+    while pending:
+        result = pending.popleft().result()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            break
+        yield result
+
+
+def _field(response, name):
+    """Field of a Pinecone response object or of the plain dict returned by the local index"""
+    if isinstance(response, dict):
+        return response.get(name)
+    return getattr(response, name, None)
+
+
+def list_vector_ids(index, namespace: str, page_size: int = LIST_PAGE_SIZE) -> list:
+    """All vector ids of the namespace, following the pagination token page by page"""
+    ids = []
+    pagination_token = None
+    with tqdm(desc="Listing vector ids") as progress:
+        while True:
+            page = index.list_paginated(limit=page_size, pagination_token=pagination_token, namespace=namespace)
+            page_ids = [_field(item, 'id') for item in _field(page, 'vectors') or []]
+            ids.extend(page_ids)
+            progress.update(len(page_ids))
+            pagination_token = _field(_field(page, 'pagination'), 'next')
+            if not pagination_token:
+                return ids
+
+
+def fetch_vectors(index, ids: list, namespace: str) -> list:
+    """(values, metadata) of each id, None for ids deleted since they were listed"""
+    vectors = _field(index.fetch(ids=ids, namespace=namespace), 'vectors') or {}
+    fetched = []
+    for vector_id in ids:
+        vector = vectors.get(vector_id)
+        fetched.append(None if vector is None else (_field(vector, 'values'), _field(vector, 'metadata') or {}))
+    return fetched
+
+
+def metadata_table(ids: list, metadata: list):
+    """
+    Parquet table of the metadata, one column per field.
+    A field holding values of different types in different rows (e.g. int and float) is stored as JSON strings
+    so it round-trips exactly; returns (table, names of the JSON columns).
+    """
+    pyarrow = _import_pyarrow()
+    fields = list(dict.fromkeys(key for row in metadata for key in row))
+    columns = {'vector_id': pyarrow.array(ids, type=pyarrow.string())}
+    json_columns = []
+    for field in fields:
+        values = [row.get(field) for row in metadata]
+        # pyarrow would silently coerce mixed ints, floats and bools to one numeric type
+        if len({type(value) for value in values if value is not None}) == 1:
+            try:
+                columns[field] = pyarrow.array(values)
+                continue
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+                pass
+        columns[field] = pyarrow.array([None if value is None else json.dumps(value) for value in values],
+                                       type=pyarrow.string())
+        json_columns.append(field)
+    return pyarrow.table(columns), json_columns
+
+
+def export_namespace(index, index_name: str, namespace: str, snapshot_dir: str, batch_size: int = 100,
+                     workers: int = 8, manifest_path: str = None) -> int:
+    """Write the snapshot of a namespace; returns the number of vectors"""
+    with metrics.stage('list'):
+        ids = list_vector_ids(index, namespace)
+    if not ids:
+        raise ValueError(f"Namespace '{namespace}' of index '{index_name}' is empty")
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    info_path = os.path.join(snapshot_dir, 'snapshot.json')
+    if os.path.exists(info_path):
+        os.remove(info_path)  # Overwriting a snapshot: it is incomplete until the new snapshot.json is written
+    vectors_path = os.path.join(snapshot_dir, 'vectors.npy')
+    tmp_path = vectors_path + '.tmp.npy'
+    batches = [ids[start:start + batch_size] for start in range(0, len(ids), batch_size)]
+    kept_ids, metadata = [], []
+    matrix = None
+
+    with metrics.stage('fetch'), ThreadPoolExecutor(max_workers=workers) as executor:
+        # Batches are fetched in parallel and written in list order into a memory-mapped .npy file; the bounded
+        # window keeps fetched but unwritten batches from piling up when writing is slower than fetching
+        fetched_batches = _bounded_map(executor, lambda batch: fetch_vectors(index, batch, namespace), batches,
+                                       workers)
+        for batch_ids, fetched in zip(batches, tqdm(fetched_batches, total=len(batches), desc="Fetching vectors")):
+            found = [(vector_id, vector) for vector_id, vector in zip(batch_ids, fetched) if vector is not None]
+            if not found:
+                continue
+            values = np.asarray([values for _, (values, _) in found], dtype=np.float32)
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                                   shape=(len(ids), values.shape[1]))
+            matrix[len(kept_ids):len(kept_ids) + len(found)] = values
+            kept_ids.extend(vector_id for vector_id, _ in found)
+            metadata.extend(vector_metadata for _, (_, vector_metadata) in found)
+    if matrix is None:
+        raise ValueError(f"No vector of namespace '{namespace}' could be fetched")
+
+    with metrics.stage('write'):
+        dimension = matrix.shape[1]
+        if len(kept_ids) < len(ids):
+            # Vectors deleted while the export ran: copy the filled rows into a file of the right size
+            print(f"{len(ids) - len(kept_ids)} vectors were deleted during the export")
+            compact = np.lib.format.open_memmap(vectors_path, mode='w+', dtype=np.float32,
+                                                shape=(len(kept_ids), matrix.shape[1]))
+            for start in range(0, len(kept_ids), 65536):
+                compact[start:start + 65536] = matrix[start:min(start + 65536, len(kept_ids))]
+            compact.flush()
+            del compact, matrix
+            os.remove(tmp_path)
+        else:
+            matrix.flush()
+            del matrix
+            os.replace(tmp_path, vectors_path)
+
+        with open(os.path.join(snapshot_dir, 'ids.json'), 'w') as f:
+            json.dump(kept_ids, f)
+        table, json_columns = metadata_table(kept_ids, metadata)
+        _import_pyarrow().parquet.write_table(table, os.path.join(snapshot_dir, 'metadata.parquet'),
+                                              compression='zstd')
+
+        manifest_path = manifest_path or default_manifest_path(index_key_of(index, index_name), namespace)
+        has_manifest = os.path.exists(manifest_path)
+        if has_manifest:
+            shutil.copyfile(manifest_path, os.path.join(snapshot_dir, 'manifest.json'))
+
+        # Written last: a directory without snapshot.json is an incomplete export
+        with open(info_path, 'w') as f:
+            json.dump({'version': SNAPSHOT_VERSION, 'index_name': index_name, 'namespace': namespace,
+                       'count': len(kept_ids), 'dimension': dimension,
+                       'embedding_dimensions': namespace_dimensions(index_key_of(index, index_name), namespace), 'json_columns': json_columns,
+                       'has_manifest': has_manifest, 'created_at': datetime.now(timezone.utc).isoformat()},
+                      f, indent=2)
+    return len(kept_ids)
+
+
+def read_snapshot_info(snapshot_dir: str) -> dict:
+    info_path = os.path.join(snapshot_dir, 'snapshot.json')
+    if not os.path.exists(info_path):
+        raise FileNotFoundError(f"{snapshot_dir} is not a complete snapshot (no snapshot.json)")
+    with open(info_path, 'r') as f:
+        info = json.load(f)
+    if info.get('version') != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {info.get('version')}")
+    return info
+
+
+def import_snapshot(index, index_name: str, namespace: str, snapshot_dir: str, batch_size: int = 100,
+                    workers: int = 8, manifest_path: str = None) -> int:
+    """Upsert a snapshot into a namespace; returns the number of vectors"""
+    info = read_snapshot_info(snapshot_dir)
+    with open(os.path.join(snapshot_dir, 'ids.json'), 'r') as f:
+        ids = json.load(f)
+    matrix = np.load(os.path.join(snapshot_dir, 'vectors.npy'), mmap_mode='r')
+    table = _import_pyarrow().parquet.read_table(os.path.join(snapshot_dir, 'metadata.parquet'))
+    json_columns = set(info.get('json_columns', []))
+
+    def upsert_batch(start):
+        # Each task reads its own slice, and at most `workers` * 2 tasks are submitted at a time
+        rows = table.slice(start, batch_size).to_pylist()
+        vectors = []
+        for vector_id, values, row in zip(ids[start:start + batch_size], matrix[start:start + batch_size], rows):
+            del row['vector_id']
+            # Fields missing from a row come back as None, Pinecone does not accept null metadata values
+            vector_metadata = {key: json.loads(value) if key in json_columns else value
+                               for key, value in row.items() if value is not None}
+            vectors.append({'id': vector_id, 'values': values.tolist(), 'metadata': vector_metadata})
+        index.upsert(vectors=vectors, namespace=namespace)
+        return len(vectors)
+
+    with metrics.stage('upsert'), ThreadPoolExecutor(max_workers=workers) as executor:
+        progress = tqdm(total=len(ids), desc="Upserting vectors")
+        for upserted in _bounded_map(executor, upsert_batch, range(0, len(ids), batch_size), workers):
+            progress.update(upserted)
+        progress.close()
+
+    if isinstance(index, LocalIndex):
+        with metrics.stage('flush'):
+            index.flush()
+    # Queries of the restored namespace must be embedded with the size its vectors were made with
+    # Only the target index's entry is written: other indexes with a namespace of the same name keep theirs
+    key = index_key_of(index, index_name)
+    if info.get('embedding_dimensions') != namespace_dimensions(key, namespace):
+        set_namespace_dimensions(key, namespace, info.get('embedding_dimensions'))
+    if info.get('has_manifest'):
+        manifest_path = manifest_path or default_manifest_path(key, namespace)
+        os.makedirs(os.path.dirname(manifest_path) or '.', exist_ok=True)
+        shutil.copyfile(os.path.join(snapshot_dir, 'manifest.json'), manifest_path)
+    return len(ids)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Export a namespace to a local snapshot, or import a snapshot')
+    parser.add_argument('action', choices=['export', 'import'],
+                        help='export: namespace -> snapshot_dir, import: snapshot_dir -> namespace')
+    parser.add_argument('--index_name', type=str, default='rfp', help='Name of the Pinecone index (or local index)')
+    parser.add_argument('--namespace', type=str, default='openai-no-chunk', help='Namespace within the index')
+    parser.add_argument('--snapshot_dir', type=str, required=True, help='Directory of the snapshot')
+    add_backend_arguments(parser)
+    parser.add_argument('--batch_size', type=int, default=100, help='Vectors per fetch / upsert request')
+    parser.add_argument('--workers', type=int, default=8, help='Number of requests sent in parallel')
+    parser.add_argument('--manifest_path', type=str, default=None,
+                        help='Ingest manifest of the namespace (default: the one store_pinecone.py uses for --backend)')
+    add_metrics_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    load_dotenv()
+    args = parse_args(argv)
+    index = open_index(args.backend, args.index_name, args.local_index_dir,
+                       args.quantization, args.rescore_factor)
+
+    if args.action == 'export':
+        count = export_namespace(index, args.index_name, args.namespace, args.snapshot_dir, args.batch_size,
+                                 args.workers, args.manifest_path)
+        print(f"Exported {count} vectors of {args.index_name}/{args.namespace} to {args.snapshot_dir}")
+    else:
+        count = import_snapshot(index, args.index_name, args.namespace, args.snapshot_dir, args.batch_size,
+                                args.workers, args.manifest_path)
+        print(f"Imported {count} vectors from {args.snapshot_dir} into {args.index_name}/{args.namespace}")
+    metrics.increment('vectors', count)
+    write_run_metrics(f"snapshot_{args.action}", args.metrics_json, args.metrics_prom)
+
+
+if __name__ == "__main__":
+    main()
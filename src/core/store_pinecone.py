@@ -1,83 +1,318 @@
 import os
-from utils.utils import load_json, load_jsonl, get_embeddings_batch, format_to_vector_dict
+from utils.utils import iter_jsonl, get_embeddings_batch, format_to_vector_dict, report_embedding_cache
 from dotenv import load_dotenv
-from openai import OpenAI
-from pinecone import Pinecone
-from tqdm import tqdm
+from utils.backends import add_backend_arguments, index_key, namespace_vector_count, open_index
+from utils.namespace_config import namespace_dimensions, set_namespace_dimensions
+from utils.manifest import IngestManifest, default_manifest_path, record_hash
+from utils.metadata_schema import add_metadata_arguments, parse_metadata_fields, project_metadata
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import islice
 import argparse
+import queue
+import threading
+from utils.tokenizer import MAX_EMBEDDING_TOKENS, TokenCounts, split_token_windows, token_counts_path
+from utils.metrics import add_metrics_arguments, metrics, write_run_metrics
 
-# To enhance the security, use .env file to load the variables without hard coding 
-load_dotenv() # .env 변수 로드
-
-# Use the 'environ' function to extract the variables from the .env file 
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-PINECONE_API_KEY = os.environ.get("PINECONE_API_KEY")
-
-# Creates an instance of the OpenAI class, using the credentials for authentication
-# Interact with OpenAI's API like generating embeddings or using GPT models
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-# Create an instance of the Pinecone class, using the credentials for authentication
-# Initialize a connection to Pinecone using to store, query, and manage vector data
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-# Use 'parser' object to pass required arguments to the program for embedding 
-# Define input descriptions that are needed to parse the jsonl file and store them into pinecone
-parser = argparse.ArgumentParser(description="Store to pinecone")
-# Parse the data.jsonl file to prepare it for storage
-# Define the 'index' argument to specify the exact location in which the numerical vectors store in pinecone
-parser.add_argument('--index', type=str, required=True, help='index')
-# Define the 'namespace' argument to group data within the same index
-# The outcomes could be separated into different groups within the same index
-parser.add_argument('--namespace', type=str, required=True, help='Namespace')
-# Define the 'jsonl_path' to specify the exact location of the file on your local computer
-parser.add_argument('--jsonl_path', type=str, required=True, help='jsonl')
-# Store command-line arguments defined in 'parser' into 'args'
-args = parser.parse_args()
+def parse_args(argv=None):
+    # Use 'parser' object to pass required arguments to the program for embedding 
+    # Define input descriptions that are needed to parse the jsonl file and store them into pinecone
+    parser = argparse.ArgumentParser(description="Store to pinecone")
+    # Parse the data.jsonl file to prepare it for storage
+    # Define the 'index' argument to specify the exact location in which the numerical vectors store in pinecone
+    parser.add_argument('--index', type=str, required=True, help='index')
+    # Define the 'namespace' argument to group data within the same index
+    # The outcomes could be separated into different groups within the same index
+    parser.add_argument('--namespace', type=str, required=True, help='Namespace')
+    # Define the 'jsonl_path' to specify the exact location of the file on your local computer
+    parser.add_argument('--jsonl_path', type=str, required=True, help='jsonl')
+    # Define the backend: 'pinecone' upserts over the network, 'local' writes a memory-mapped float32 matrix + id map
+    add_backend_arguments(parser)
+    # Define the pipeline options: embedding batches are packed by token budget and overlap with the upserts
+    parser.add_argument('--pipelined', action='store_true', help='Overlap embedding and upserts with worker threads')
+    parser.add_argument('--max_batch_tokens', type=int, default=100000, help='Token budget of one embedding request')
+    parser.add_argument('--upsert_batch_size', type=int, default=100, help='Number of vectors per upsert request')
+    parser.add_argument('--embed_workers', type=int, default=4, help='Number of embedding threads')
+    parser.add_argument('--upsert_workers', type=int, default=2, help='Number of upsert threads')
+    # Define the manifest: vector id (postingId) -> hash of description + metadata, used to only re-embed new or changed RFPs
+    parser.add_argument('--manifest_path', type=str, default=None, help='Ingest manifest (default: ../../datasets/manifests/<backend>__<index>__<namespace>.json, the local index directory is hashed into the backend part)')
+    parser.add_argument('--full', action='store_true', help='Ignore the manifest and re-embed every record')
+    # Define the chunking options: long descriptions are split into overlapping token windows instead of being truncated
+    parser.add_argument('--chunk_tokens', type=int, default=0, help='Chunk size in tokens (0 disables chunking)')
+    parser.add_argument('--chunk_overlap', type=int, default=200, help='Number of tokens shared by consecutive chunks')
+    # Define the embedding size of the namespace: text-embedding-3 models can return shortened vectors (e.g. 256, 1024 instead of 3072)
+    # The value is recorded per index namespace (datasets/namespaces.json) so the query scripts embed their questions with the same size
+    parser.add_argument('--dimensions', type=int, default=None, help='Embedding dimensions of the namespace (default: recorded value, else full size)')
+    # Define the metadata schema: only the fields queries filter on are upserted, display fields are read from the dataset for the final matches
+    add_metadata_arguments(parser)
+    # Define the metrics outputs: stage timings, API latencies and token usage are written at the end of the run
+    add_metrics_arguments(parser)
+    # Store command-line arguments defined in 'parser' into 'args'
+    return parser.parse_args(argv)
 
 # Embedding process for the texts in RPFs and store the outcomes of numerical vectors into Pinecone (a vector database)
 # index : the location where numerical vectors are stored 
-# chunks: list -> text chunks prepared for embedding *Converting JSON file into list  
-# metadata_list includes other information execpt for 'description', the main source for embedding, such as 'PostingId'
+# records: iterable of (vector_id, description, metadata) -> streamed from the JSONL file so the whole dataset is never held in memory
+# metadata includes other information execpt for 'description', the main source for embedding, such as 'PostingId'
 # batch_size -> Set a maximum of 100 text chunks to be embedded at once (Converting text chunks into numerical vectors)
-def store_vector_to_pinecone(index, chunks: list, metadata_list: list, namespace, batch_size=100):
+# dimensions -> shortened embedding size of the namespace (None: full size)
+def store_vector_to_pinecone(index, records, namespace, batch_size=100, dimensions=None):
 # tqdm shows the progress bar of embedding process
 # text chunks are divided into batches of 100 and each bach is embedded separately (0~99, 100~199, 200~299...)
-    for i in tqdm(range(0, len(chunks), batch_size), desc=f"Storing vectors to pinecone..."):
-        batch_chunks = chunks[i:i + batch_size] # Store text chunks of the RFPs by 100 (descriptions) 
-        batch_metadata = metadata_list[i:i + batch_size] # Store the corresponding metadata in batches of 100
-        embeddings = get_embeddings_batch(batch_chunks)  # Embedding the current batch of 100 text chunks 
+    from tqdm import tqdm
+    records = iter(records)
+    progress = tqdm(desc=f"Storing vectors to pinecone...")
+    while batch := list(islice(records, batch_size)): # Take the next 100 records from the stream
+        batch_ids = [vector_id for vector_id, _, _ in batch] # Stable ids (postingId) of the records
+        batch_chunks = [chunk for _, chunk, _ in batch] # Store text chunks of the RFPs by 100 (descriptions) 
+        batch_metadata = [metadata for _, _, metadata in batch] # Store the corresponding metadata in batches of 100
+        embeddings = get_embeddings_batch(batch_chunks, dimensions=dimensions)  # Embedding the current batch of 100 text chunks 
         
         vectors = []
         # embedding : individual vector for the description of each RFP
         # metadata : individual dictionary for the corresponding metadata of the description
-        for chunk_index, (embedding, metadata) in enumerate(zip(embeddings, batch_metadata), start=i):
-            # Convert metadata values to acceptable formats
-            for key, value in metadata.items():
-                # Verify whether 'value' in metadata is a list and if all items within the list of value are not string, it returns true
-                if isinstance(value, list) and not all(isinstance(item, str) for item in value):
-                    metadata[key] = [str(item) for item in value]  # Convert all items in a list into string 
-                elif not isinstance(value, (str, int, float, bool)): # If value is not 'str' , 'int' ,'float' and 'bool'
-                    metadata[key] = str(value)  # Convert other types to string
-            vector_id = f"{chunk_index}" # id는 반드시 str이어야 함
-            vector_dict = format_to_vector_dict(vector_id, embedding, metadata)
+        for vector_id, embedding, metadata in zip(batch_ids, embeddings, batch_metadata):
+            vector_dict = format_to_vector_dict(vector_id, embedding, sanitize_metadata(metadata))
             vectors.append(vector_dict)
         
         index.upsert(vectors=vectors, namespace=namespace) # Store vectors into Pinecone 
+        progress.update(len(batch))
+    progress.close()
 
-def collect_chunks_and_metadata_from_path(file_path):
-    all_chunks = [] # Store all the descriptions 
-    all_metadata = [] # Store the corresponding metadata (other information except for descriptions)
-    dataset = load_jsonl(file_path) # Load the JSAONL file into list 
-    for data in dataset:
-        description = data["description"]
-        metadata = {key: value for key, value in data.items() if key != "description"}
-        all_chunks.append(description) # Only store 'description' 
-        all_metadata.append(metadata) # Store all key: value pairs if key is not description 
-    return all_chunks, all_metadata
+# Convert metadata values to formats accepted by Pinecone
+def sanitize_metadata(metadata: dict):
+    for key, value in metadata.items():
+        # Verify whether 'value' in metadata is a list and if all items within the list of value are not string, it returns true
+        if isinstance(value, list) and not all(isinstance(item, str) for item in value):
+            metadata[key] = [str(item) for item in value]  # Convert all items in a list into string 
+        elif not isinstance(value, (str, int, float, bool)): # If value is not 'str' , 'int' ,'float' and 'bool'
+            metadata[key] = str(value)  # Convert other types to string
+    return metadata
 
-if __name__ == "__main__":
-    index = pc.Index(args.index) # Define index of Pincone which is the exact location for storing vectors 
+# Group the (vector_id, chunk, metadata) records into embedding batches by token budget instead of a fixed count
+# Long RFPs get small batches (staying under the per-request token limit), short RFPs get large ones (fewer round trips)
+# max_batch_size -> the embeddings API also limits the number of inputs per request
+# token_counts -> persisted per-record token counts, so records are only tokenized the first time they are seen
+def pack_batches_by_tokens(records, max_batch_tokens=100000, max_batch_size=2048, token_counts=None):
+    token_counts = token_counts or TokenCounts()
+    records = iter(records)
+    batch = []
+    batch_tokens = 0
+    # Count tokens for windows of records at once (threaded encode_batch for the uncounted ones)
+    while window := list(islice(records, 1024)):
+        counts = token_counts.get_many([chunk for _, chunk, _ in window])
+        for (vector_id, chunk, metadata), n_tokens in zip(window, counts):
+            n_tokens = min(n_tokens, MAX_EMBEDDING_TOKENS) # get_embeddings_batch truncates to 8192 tokens
+            if batch and (batch_tokens + n_tokens > max_batch_tokens or len(batch) >= max_batch_size):
+                yield batch
+                batch = []
+                batch_tokens = 0
+            batch.append((vector_id, chunk, metadata))
+            batch_tokens += n_tokens
+    if batch:
+        yield batch
+
+# Pipelined version of store_vector_to_pinecone
+# Embedding threads take token-packed batches from embed_queue, and put the vectors into upsert_queue in slices of upsert_batch_size
+# Upsert threads take the slices and store them, so embedding of upcoming batches overlaps with the upserts of finished ones
+# Both queues are bounded (queue_size) so memory stays flat when one side is slower than the other
+def store_vector_to_pinecone_pipelined(index, records, namespace, max_batch_tokens=100000,
+                                       upsert_batch_size=100, embed_workers=4, upsert_workers=2, queue_size=8,
+                                       token_counts=None, dimensions=None):
+    from tqdm import tqdm
+    progress = tqdm(desc="Storing vectors to pinecone...")
+    # Workers finish their batches in any order, so a record whose id comes again later in the stream (rows appended
+    # by --incremental) is held back and upserted in a second pass, once every earlier vector has landed.
+    # The last occurrence wins, as in utils.record_store
+    sent_ids = set()
+    held_back = {}
+
+    def first_occurrences(records):
+        for record in records:
+            if record[0] in sent_ids:
+                held_back[record[0]] = record
+            else:
+                sent_ids.add(record[0])
+                yield record
+
+    def run(records):
+        embed_queue = queue.Queue(maxsize=queue_size)
+        upsert_queue = queue.Queue(maxsize=queue_size)
+        stop = threading.Event() # Set when a worker or the producer fails, so the other threads stop instead of blocking forever
+
+        def put(target_queue, item):
+            while not stop.is_set():
+                try:
+                    target_queue.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def get(source_queue):
+            while not stop.is_set():
+                try:
+                    return source_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            return None
+
+        def embed_worker():
+            while (batch := get(embed_queue)) is not None:
+                try:
+                    embeddings = get_embeddings_batch([chunk for _, chunk, _ in batch], dimensions=dimensions)
+                    vectors = [format_to_vector_dict(vector_id, embedding, sanitize_metadata(metadata))
+                               for (vector_id, _, metadata), embedding in zip(batch, embeddings)]
+                except Exception:
+                    stop.set()
+                    raise
+                for start in range(0, len(vectors), upsert_batch_size):
+                    put(upsert_queue, vectors[start:start + upsert_batch_size])
+
+        def upsert_worker():
+            while (vectors := get(upsert_queue)) is not None:
+                try:
+                    index.upsert(vectors=vectors, namespace=namespace) # Store vectors into Pinecone 
+                except Exception:
+                    stop.set()
+                    raise
+                progress.update(len(vectors))
+
+        with ThreadPoolExecutor(max_workers=embed_workers + upsert_workers) as pool:
+            embed_futures = [pool.submit(embed_worker) for _ in range(embed_workers)]
+            upsert_futures = [pool.submit(upsert_worker) for _ in range(upsert_workers)]
+            try:
+                for batch in pack_batches_by_tokens(records, max_batch_tokens, token_counts=token_counts):
+                    if stop.is_set():
+                        break
+                    put(embed_queue, batch)
+            except BaseException:
+                # Reading or packing the records failed: release the workers, otherwise the pool waits on them forever
+                stop.set()
+                raise
+            # None tells each worker that no more work is coming
+            for _ in embed_futures:
+                put(embed_queue, None)
+            wait(embed_futures)
+            for _ in upsert_futures:
+                put(upsert_queue, None)
+            wait(upsert_futures)
+
+        # Re-raise the first worker error, if any
+        for future in embed_futures + upsert_futures:
+            future.result()
+
+    try:
+        run(first_occurrences(records))
+        if held_back:
+            run(iter(held_back.values()))
+    finally:
+        progress.close()
+
+# Stable vector id of a record: its postingId (falls back to the Supabase row id)
+# Unlike the position in the JSONL file, it does not change when the data is re-extracted in a different order
+def vector_id_for(data: dict):
+    posting_id = data.get("postingId") or data.get("id")
+    if posting_id is None or posting_id == "":
+        raise ValueError("Record has neither 'postingId' nor 'id' to use as vector id")
+    return str(posting_id)
 
-    chunks, metadata = collect_chunks_and_metadata_from_path(args.jsonl_path) # Store description chunks and metadata for the corresponding descriptions 
-    store_vector_to_pinecone(index, chunks, metadata, args.namespace) # Embedding the texts and store the results in Pinecone 
+# Stream (vector_id, description, metadata) from the JSONL file one record at a time
+def iter_chunks_and_metadata_from_path(file_path):
+    for data in iter_jsonl(file_path): # Read the JSONL file line by line instead of loading it into a list 
+        vector_id = vector_id_for(data)
+        description = data.pop("description") # Only embed 'description' 
+        yield vector_id, description, data # The remaining key: value pairs are the metadata 
+
+# Chunked mode: split each description into token windows with overlap
+# Chunk vectors get the id "<postingId>#chunk<n>" and keep the parent postingId in their metadata ('parent_id')
+# so the query side can pool chunk scores per RFP
+def expand_into_chunks(records, chunk_tokens, chunk_overlap=200):
+    from utils.scoring import chunk_vector_id
+    for vector_id, description, metadata in records:
+        for chunk_index, chunk in enumerate(split_token_windows(description, chunk_tokens, chunk_overlap)):
+            chunk_metadata = dict(metadata, parent_id=vector_id, chunk_index=chunk_index)
+            yield chunk_vector_id(vector_id, chunk_index), chunk, chunk_metadata
+
+# Keep only the metadata schema fields of each record (fields=None keeps every field)
+# Runs before the manifest check, so the hashes cover the metadata actually stored and a schema change re-upserts the vectors
+def project_record_metadata(records, fields):
+    for vector_id, description, metadata in records:
+        yield vector_id, description, project_metadata(metadata, fields)
+
+# Only let new or changed records through, comparing the hash of description + metadata with the manifest
+# force -> let every record through (full re-index) while still recording the hashes
+def filter_changed_records(records, manifest: IngestManifest, force=False):
+    for vector_id, description, metadata in records:
+        if manifest.is_changed(vector_id, record_hash(description, metadata)) or force:
+            yield vector_id, description, metadata
+
+# Delete the vectors of records that are no longer in the dataset (Pinecone accepts up to 1000 ids per delete)
+def delete_removed_vectors(index, manifest: IngestManifest, namespace, batch_size=1000):
+    removed_ids = manifest.removed_ids()
+    for i in range(0, len(removed_ids), batch_size):
+        index.delete(ids=removed_ids[i:i + batch_size], namespace=namespace)
+    manifest.forget(removed_ids)
+    return removed_ids
+
+def main(argv=None):
+    # To enhance the security, use .env file to load the variables without hard coding 
+    load_dotenv() # .env 변수 로드
+    args = parse_args(argv)
+
+    # The namespace keeps the embedding size it was created with, unless it is fully re-indexed
+    key = index_key(args.backend, args.index, args.local_index_dir) # Manifests and namespace settings are kept per backend and index 
+    dimensions = namespace_dimensions(key, args.namespace)
+    if args.dimensions is not None and args.dimensions != dimensions:
+        if dimensions is not None and not args.full:
+            raise ValueError(f"Namespace '{args.namespace}' holds {dimensions}-dimension vectors, use --full to re-index it with {args.dimensions}")
+        dimensions = args.dimensions
+
+    index = open_index(args.backend, args.index, args.local_index_dir,
+                       args.quantization, args.rescore_factor) # Define index of Pincone (or the local index) which is the exact location for storing vectors 
+
+    # One manifest per backend (and local index directory): a Pinecone ingest says nothing about what a local index holds
+    manifest_path = args.manifest_path or default_manifest_path(key, args.namespace)
+    manifest = IngestManifest(manifest_path)
+    # A manifest listing records of an empty namespace (recreated index, deleted namespace) would skip every record
+    if manifest.hashes and not args.full and namespace_vector_count(index, args.namespace) == 0:
+        print(f"Namespace '{args.namespace}' is empty but the manifest lists {len(manifest.hashes)} records, re-ingesting every record")
+        manifest.reset()
+
+    records = iter_chunks_and_metadata_from_path(args.jsonl_path) # Stream description chunks and metadata for the corresponding descriptions 
+    if args.chunk_tokens:
+        records = expand_into_chunks(records, args.chunk_tokens, args.chunk_overlap) # The manifest then tracks every chunk 
+    records = project_record_metadata(records, parse_metadata_fields(args.metadata_fields)) # Filterable fields only 
+    records = filter_changed_records(records, manifest, force=args.full) # Skip the records that are unchanged since the last run 
+    # Reading, embedding and upserting are streamed together: the per-call latencies tell them apart
+    with metrics.stage('embed_and_upsert'):
+        if args.pipelined:
+            token_counts = TokenCounts(token_counts_path(args.jsonl_path)) # Token counts persisted next to the dataset 
+            store_vector_to_pinecone_pipelined(index, records, args.namespace,
+                                               max_batch_tokens=args.max_batch_tokens,
+                                               upsert_batch_size=args.upsert_batch_size,
+                                               embed_workers=args.embed_workers,
+                                               upsert_workers=args.upsert_workers,
+                                               token_counts=token_counts,
+                                               dimensions=dimensions)
+            token_counts.save()
+        else:
+            store_vector_to_pinecone(index, records, args.namespace, dimensions=dimensions) # Embedding the texts and store the results in Pinecone 
+    with metrics.stage('delete_removed'):
+        removed_ids = delete_removed_vectors(index, manifest, args.namespace)
+    with metrics.stage('record_index'):
+        from utils.record_store import build_record_index
+        build_record_index(args.jsonl_path) # Byte offsets of the records, so the query scripts hydrate matches by postingId without loading the dataset
+    if args.backend == 'local':
+        with metrics.stage('flush'):
+            index.flush() # Write the id map and metadata of the local index to disk (and its int8 copy with --quantization int8)
+    if dimensions != namespace_dimensions(key, args.namespace):
+        set_namespace_dimensions(key, args.namespace, dimensions)
+    manifest.save() # Only saved after a successful run, so a failed run is fully retried next time
+    print(f"Seen {len(manifest.seen)} records: {manifest.changed} new or changed, {len(removed_ids)} removed")
+    metrics.increment('records_seen', len(manifest.seen))
+    metrics.increment('records_changed', manifest.changed)
+    metrics.increment('records_removed', len(removed_ids))
+    report_embedding_cache() # Unchanged descriptions are served from the local embedding cache
+    write_run_metrics('store_pinecone', args.metrics_json, args.metrics_prom)
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,241 @@
+import hashlib
 import json
-import openai
-from typing import List, Dict
+from typing import TYPE_CHECKING, Dict, Iterable, List
 import os
+import time
 import argparse
-from supabase import create_client, Client
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from dotenv import load_dotenv
+from utils.supabase_utils import iter_table_rows
+from utils.verdict_cache import VerdictCache, DEFAULT_VERDICT_CACHE_PATH
+from utils.metrics import add_metrics_arguments, metrics, write_run_metrics
 
-def is_utility_industry(description: str, client: openai.Client) -> bool:
+# openai and supabase are imported where the clients are created, so `--help` and imports of this module stay fast
+if TYPE_CHECKING:
+    import openai
+
+UTILITY_SYSTEM_PROMPT = "You are a classifier that determines if a RFP description is related to the utility industry (electricity, water, gas, etc.). Reply with only 'yes' or 'no'."
+BATCH_SYSTEM_PROMPT = (
+    "You are a classifier that determines if RFP descriptions are related to the utility industry "
+    "(electricity, water, gas, etc.). You will receive numbered descriptions. Reply with a JSON object "
+    "{\"answers\": [...]} holding exactly one 'yes' or 'no' per description, in the same order."
+)
+CLASSIFIER_MODEL = "gpt-3.5-turbo"
+# Bump when the way answers are parsed into verdicts changes (prompt edits are picked up by the hash below)
+CLASSIFIER_VERSION = 1
+
+
+def classifier_cache_namespace() -> str:
+    """Verdict cache namespace: model, classifier version and a hash of the prompts, so edits never reuse old verdicts"""
+    prompts = "\n".join((UTILITY_SYSTEM_PROMPT, BATCH_SYSTEM_PROMPT))
+    prompt_hash = hashlib.sha256(prompts.encode('utf-8')).hexdigest()[:12]
+    return f"utility:{CLASSIFIER_MODEL}:v{CLASSIFIER_VERSION}:{prompt_hash}"
+
+
+class ClassificationError(Exception):
+    """Raised when a description could not be classified (as opposed to a real 'no' answer)"""
+
+
+def _create_completion(client: 'openai.Client', messages: List[Dict], max_retries: int = 3, **kwargs):
+    """Chat completion with exponential backoff; raises ClassificationError once the retries are used up"""
+    for attempt in range(max_retries):
+        try:
+            with metrics.timer('openai.chat'):
+                response = client.chat.completions.create(
+                    model=CLASSIFIER_MODEL,
+                    messages=messages,
+                    temperature=0,
+                    **kwargs
+                )
+            metrics.record_usage('openai.chat', getattr(response, 'usage', None))
+            return response
+        except Exception as e:
+            print(f"Error classifying description (attempt {attempt + 1}): {e}")
+            if attempt < max_retries - 1:
+                metrics.increment('openai.chat.retries')
+                time.sleep(2 ** attempt)  # Exponential backoff
+            else:
+                raise ClassificationError(str(e)) from e
+
+
+def _parse_verdict(answer) -> bool:
+    """True for 'yes', False for 'no'; any other answer (empty, 'maybe', garbled) is an error, not a 'no'"""
+    verdict = str(answer).lower().strip().rstrip('.')
+    if verdict not in ('yes', 'no'):
+        raise ClassificationError(f"Unexpected answer: {answer!r}")
+    return verdict == 'yes'
+
+
+def is_utility_industry(description: str, client: 'openai.Client', max_retries: int = 3) -> bool:
+    """
+    Check if the description is related to utility industry using OpenAI API.
+    Raises ClassificationError if the reply is neither 'yes' nor 'no'.
+    """
+    response = _create_completion(
+        client,
+        [
+            {"role": "system", "content": UTILITY_SYSTEM_PROMPT},
+            {"role": "user", "content": description}
+        ],
+        max_retries=max_retries
+    )
+    return _parse_verdict(response.choices[0].message.content)
+
+
+def classify_utility_batch(descriptions: List[str], client: 'openai.Client', max_retries: int = 3) -> List[bool]:
     """
-    Check if the description is related to utility industry using OpenAI API
+    Classify several short descriptions with a single structured prompt.
+    Raises ClassificationError if the answer does not hold exactly one 'yes' or 'no' per description.
     """
+    numbered = "\n\n".join(f"{i}. {description}" for i, description in enumerate(descriptions, start=1))
+    response = _create_completion(
+        client,
+        [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": numbered}
+        ],
+        max_retries=max_retries,
+        response_format={"type": "json_object"}
+    )
     try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a classifier that determines if a RFP description is related to the utility industry (electricity, water, gas, etc.). Reply with only 'yes' or 'no'."
-                },
-                {
-                    "role": "user",
-                    "content": description
-                }
-            ],
-            temperature=0
-        )
-        return response.choices[0].message.content.lower().strip() == 'yes'
-    except Exception as e:
-        print(f"Error classifying description: {e}")
-        return False
-
-def filter_utility_rfps(data: List[Dict], api_key: str, output_path: str) -> None:
+        answers = json.loads(response.choices[0].message.content)["answers"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ClassificationError(f"Malformed batch answer: {e}") from e
+    if not isinstance(answers, list) or len(answers) != len(descriptions):
+        raise ClassificationError(f"Expected {len(descriptions)} answers, got {answers!r}")
+    return [_parse_verdict(answer) for answer in answers]
+
+
+def _classify_task(descriptions: List[str], client: 'openai.Client', max_retries: int) -> List:
     """
-    Filter and save utility industry RFPs to JSONL file
+    Classify one task (a single description or a pack of short ones).
+    Returns one verdict per description, or the ClassificationError for descriptions that failed.
     """
-    client = openai.Client(api_key=api_key)
-    with open(output_path, 'w', encoding='utf-8') as f:
-        for record in data:
-            if len(record.get("description", "")) > 0:
-                if is_utility_industry(record["description"], client):
+    if len(descriptions) > 1:
+        try:
+            return classify_utility_batch(descriptions, client, max_retries)
+        except ClassificationError as e:
+            print(f"Falling back to one request per description: {e}")
+            metrics.increment('classifier.batch_fallbacks')
+    verdicts = []
+    for description in descriptions:
+        try:
+            verdicts.append(is_utility_industry(description, client, max_retries))
+        except ClassificationError as e:
+            verdicts.append(e)
+    return verdicts
+
+
+def _pack_tasks(descriptions: List[str], pack_size: int, pack_max_chars: int) -> List[List[int]]:
+    """Group positions of short descriptions into packs of pack_size; long descriptions get their own task"""
+    tasks = []
+    pack = []
+    for position, description in enumerate(descriptions):
+        if pack_size <= 1 or len(description) > pack_max_chars:
+            tasks.append([position])
+            continue
+        pack.append(position)
+        if len(pack) == pack_size:
+            tasks.append(pack)
+            pack = []
+    if pack:
+        tasks.append(pack)
+    return tasks
+
+
+def filter_utility_rfps(data: Iterable[Dict], api_key: str, output_path: str, workers: int = 8,
+                        pack_size: int = 1, pack_max_chars: int = 1500, max_retries: int = 3,
+                        cache_path: str = DEFAULT_VERDICT_CACHE_PATH) -> None:
+    """
+    Filter and save utility industry RFPs to JSONL file.
+    Records are classified concurrently in windows, verdicts are cached by description hash,
+    and records that could not be classified are written to <output_path>.errors.jsonl instead of being dropped.
+    """
+    import openai
+    client = openai.Client(api_key=api_key, base_url=os.environ.get("OPENAI_BASE_URL") or None)
+    cache = VerdictCache(cache_path, namespace=classifier_cache_namespace()) if cache_path else None
+    window_size = workers * max(pack_size, 1) * 4
+    counts = {'utility': 0, 'other': 0, 'errors': 0}
+    
+    with open(output_path, 'w', encoding='utf-8') as f, \
+            open(output_path + '.errors.jsonl', 'w', encoding='utf-8') as errors_file, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        records = (record for record in data if len(record.get("description") or "") > 0)
+        from tqdm import tqdm
+        progress = tqdm(desc="Classifying RFPs")
+        while window := list(islice(records, window_size)):
+            descriptions = [record["description"] for record in window]
+            verdicts = cache.get_many(descriptions) if cache else [None] * len(window)
+            
+            # Classify the descriptions missing from the cache concurrently
+            missing = [position for position, verdict in enumerate(verdicts) if verdict is None]
+            missing_descriptions = [descriptions[position] for position in missing]
+            tasks = _pack_tasks(missing_descriptions, pack_size, pack_max_chars)
+            futures = [pool.submit(_classify_task, [missing_descriptions[i] for i in task], client, max_retries)
+                       for task in tasks]
+            new_descriptions, new_verdicts = [], []
+            for task, future in zip(tasks, futures):
+                for i, verdict in zip(task, future.result()):
+                    verdicts[missing[i]] = verdict
+                    if not isinstance(verdict, ClassificationError):
+                        new_descriptions.append(missing_descriptions[i])
+                        new_verdicts.append(verdict)
+            if cache and new_descriptions:
+                with metrics.timer('verdict_cache.put'):
+                    cache.put_many(new_descriptions, new_verdicts)
+            
+            # Write the window in its original order
+            for record, verdict in zip(window, verdicts):
+                if isinstance(verdict, ClassificationError):
+                    counts['errors'] += 1
+                    metrics.increment('classifier.errors')
+                    errors_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+                elif verdict:
+                    counts['utility'] += 1
                     f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                else:
+                    counts['other'] += 1
+            progress.update(len(window))
+        progress.close()
+    
+    print(f"Utility RFPs: {counts['utility']}, other: {counts['other']}, failed to classify: {counts['errors']}")
+    if cache:
+        print(f"Verdict cache: {cache.hits} hits, {cache.misses} misses")
+        metrics.increment('verdict_cache.hits', cache.hits)
+        metrics.increment('verdict_cache.misses', cache.misses)
+        cache.close()
+    if counts['errors']:
+        print(f"Records that could not be classified were saved to {output_path}.errors.jsonl")
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument('--output_path', 
                        type=str, 
                        default='../../datasets/utility_rfps.jsonl',
                        help='Path to save the filtered utility RFPs')
-    args = parser.parse_args()
+    parser.add_argument('--page_size', 
+                       type=int, 
+                       default=1000,
+                       help='Number of rows fetched from Supabase per request')
+    parser.add_argument('--workers', 
+                       type=int, 
+                       default=8,
+                       help='Number of concurrent classification requests')
+    parser.add_argument('--pack_size', 
+                       type=int, 
+                       default=1,
+                       help='Number of short descriptions classified per request (1 disables packing)')
+    parser.add_argument('--pack_max_chars', 
+                       type=int, 
+                       default=1500,
+                       help='Descriptions longer than this are always classified on their own')
+    parser.add_argument('--cache_path', 
+                       type=str, 
+                       default=DEFAULT_VERDICT_CACHE_PATH,
+                       help='Path of the verdict cache ("" disables caching)')
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
 
     # Load environment variables
     load_dotenv()
@@ -58,14 +246,17 @@ def main():
     api_key = os.environ.get("OPENAI_API_KEY")
     
     # Initialize Supabase client
-    supabase: Client = create_client(url, key)
+    from supabase import create_client
+    supabase = create_client(url, key)
     
-    # Fetch data from Supabase
-    response = supabase.table("data").select("*").execute()
-    data = response.data
+    # Fetch data from Supabase page by page
+    data = iter_table_rows(supabase, "data", page_size=args.page_size)
     
-    # Filter and save utility RFPs
-    filter_utility_rfps(data, api_key, args.output_path)
+    # Filter and save utility RFPs (fetching and classification are interleaved, so they form one stage)
+    with metrics.stage('fetch_and_classify'):
+        filter_utility_rfps(data, api_key, args.output_path, workers=args.workers, pack_size=args.pack_size,
+                            pack_max_chars=args.pack_max_chars, cache_path=args.cache_path)
+    write_run_metrics('utility_data', args.metrics_json, args.metrics_prom)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,112 @@
+import hashlib
+import os
+
+from utils.metrics import metrics
+
+DEFAULT_LOCAL_INDEX_DIR = '../../datasets/local_index'
+# Largest top_k a Pinecone query accepts
+PINECONE_MAX_TOP_K = 10000
+
+
+def add_backend_arguments(parser):
+    """Register the vector backend options shared by the ingest and matching scripts"""
+    parser.add_argument('--backend', type=str, choices=['pinecone', 'local'], default='pinecone',
+                        help='Vector search backend: Pinecone index or local memory-mapped index')
+    parser.add_argument('--local_index_dir', type=str, default=DEFAULT_LOCAL_INDEX_DIR,
+                        help='Directory of the local index (used with --backend local)')
+    parser.add_argument('--quantization', type=str, choices=['none', 'int8'], default='none',
+                        help='Scan an int8 copy of the local index instead of the float32 vectors (used with --backend local)')
+    parser.add_argument('--rescore_factor', type=int, default=4,
+                        help='With --quantization int8, rescore the top_k * factor best candidates with the float32 vectors (0: no rescoring)')
+
+
+def index_key(backend: str, index_name: str, local_index_dir: str = DEFAULT_LOCAL_INDEX_DIR) -> str:
+    """
+    Name of an index that tells backends apart: 'pinecone__<index>', or 'local-<hash>__<index>' where the hash is
+    that of the local index directory, so state kept per index (manifests, namespace settings) is not shared
+    across stores
+    """
+    if backend == 'local':
+        directory = os.path.abspath(os.path.join(local_index_dir, index_name))
+        return f"local-{hashlib.sha256(directory.encode('utf-8')).hexdigest()[:12]}__{index_name}"
+    return f"{backend}__{index_name}"
+
+
+def index_key_of(index, index_name: str) -> str:
+    """index_key of an opened index: a LocalIndex knows its directory, anything else is a Pinecone index"""
+    from utils.local_index import LocalIndex
+    if isinstance(index, LocalIndex):
+        return index_key('local', index_name, os.path.dirname(index.root))
+    return index_key('pinecone', index_name)
+
+
+def namespace_vector_count(index, namespace: str) -> int:
+    """Number of vectors in a namespace of a Pinecone or local index (0 when the namespace does not exist)"""
+    stats = index.describe_index_stats()
+    namespaces = stats.get('namespaces') if isinstance(stats, dict) else getattr(stats, 'namespaces', None)
+    summary = (namespaces or {}).get(namespace)
+    if summary is None:
+        return 0
+    return summary.get('vector_count', 0) if isinstance(summary, dict) else summary.vector_count
+
+
+def add_pooling_arguments(parser):
+    """Register the options for querying a chunked namespace (see store_pinecone.py --chunk_tokens)"""
+    parser.add_argument('--pooling', type=str, choices=['none', 'max', 'mean_top_m'], default='none',
+                        help='Pool chunk scores per RFP for chunked namespaces (none: unchunked namespace)')
+    parser.add_argument('--top_m', type=int, default=3,
+                        help='Number of best chunks averaged per RFP with --pooling mean_top_m')
+
+
+class InstrumentedIndex:
+    """Pinecone Index proxy recording the latency and errors of upsert / query / delete / fetch / list / stats calls"""
+
+    def __init__(self, index):
+        self._index = index
+
+    def upsert(self, *args, **kwargs):
+        with metrics.timer('pinecone.upsert'):
+            return self._index.upsert(*args, **kwargs)
+
+    def query(self, *args, **kwargs):
+        with metrics.timer('pinecone.query'):
+            return self._index.query(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with metrics.timer('pinecone.delete'):
+            return self._index.delete(*args, **kwargs)
+
+    def fetch(self, *args, **kwargs):
+        with metrics.timer('pinecone.fetch'):
+            return self._index.fetch(*args, **kwargs)
+
+    def list_paginated(self, *args, **kwargs):
+        with metrics.timer('pinecone.list'):
+            return self._index.list_paginated(*args, **kwargs)
+
+    def describe_index_stats(self, *args, **kwargs):
+        with metrics.timer('pinecone.describe_index_stats'):
+            return self._index.describe_index_stats(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._index, name)
+
+
+def open_index(backend: str, index_name: str, local_index_dir: str = DEFAULT_LOCAL_INDEX_DIR,
+               quantization: str = 'none', rescore_factor: int = 4):
+    """Return an object with the Pinecone Index query/upsert interface for the selected backend"""
+    if backend == 'local':
+        # Imported here so that modules needing only the options or constants do not load numpy
+        from utils.local_index import LocalIndex
+        return LocalIndex(os.path.join(local_index_dir, index_name), quantization, rescore_factor)
+
+    from pinecone import Pinecone
+    pinecone_api_key = os.environ.get("PINECONE_API_KEY")
+    if not pinecone_api_key:
+        raise ValueError("Missing PINECONE_API_KEY in environment variables")
+    pc = Pinecone(api_key=pinecone_api_key)
+    # PINECONE_HOST addresses the index directly (e.g. the local stand-in server) instead of resolving it by name
+    pinecone_host = os.environ.get("PINECONE_HOST")
+    if pinecone_host:
+        return InstrumentedIndex(pc.Index(index_name, host=pinecone_host))
+    return InstrumentedIndex(pc.Index(index_name))
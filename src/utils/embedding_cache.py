@@ -0,0 +1,220 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Default location of the on-disk cache (project root /.cache), overridable with EMBEDDING_CACHE_PATH
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '.cache', 'embeddings.sqlite')
+# Default upper bound of the stored vectors, overridable with EMBEDDING_CACHE_MAX_BYTES (2 GB)
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def text_key(model: str, text: str) -> str:
+    """Content address of an embedding: model name + sha256 of the (already truncated) text"""
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return f"{model}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    SQLite backed embedding cache.
+    Vectors are stored as float32 blobs keyed by model name and text hash.
+    When the total size exceeds max_bytes, the least recently used entries are evicted. The total is kept as a
+    running count in the cache_meta table, updated in the same transaction as the rows, so a write does not scan
+    the whole table.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        # The cache is shared by the ingest worker threads, so a single connection is guarded by a lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, "
+            "vector BLOB NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        # A cache written before the running total existed is scanned once to initialise it
+        if self._conn.execute("SELECT 1 FROM cache_meta WHERE name = 'total_bytes'").fetchone() is None:
+            self._conn.execute("INSERT INTO cache_meta (name, value) "
+                               "SELECT 'total_bytes', COALESCE(SUM(size), 0) FROM embeddings")
+        self._conn.commit()
+
+    def _total_bytes(self) -> int:
+        return self._conn.execute("SELECT value FROM cache_meta WHERE name = 'total_bytes'").fetchone()[0]
+
+    def _add_bytes(self, delta: int) -> None:
+        self._conn.execute("UPDATE cache_meta SET value = value + ? WHERE name = 'total_bytes'", (delta,))
+
+    def get_many(self, model: str, texts: list) -> list:
+        """Return cached vectors (list of floats) for texts, None where the text is not cached"""
+        keys = [text_key(model, text) for text in texts]
+        found = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters, so look keys up in slices
+            for i in range(0, len(keys), 500):
+                batch_keys = keys[i:i + 500]
+                placeholders = ','.join('?' * len(batch_keys))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch_keys
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for result in results if result is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, texts: list, vectors: list) -> None:
+        """Store vectors for texts and evict old entries if the cache grew past max_bytes"""
+        now = time.time()
+        # Keyed by cache key, so a text repeated in the batch is counted once
+        rows = {}
+        for text, vector in zip(texts, vectors):
+            key = text_key(model, text)
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows[key] = (key, blob, len(blob), now)
+        keys = list(rows)
+        with self._lock:
+            # One write transaction: other processes sharing the file see the rows and the running total change together
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                replaced_bytes = 0
+                for i in range(0, len(keys), 500):
+                    batch_keys = keys[i:i + 500]
+                    placeholders = ','.join('?' * len(batch_keys))
+                    replaced_bytes += self._conn.execute(
+                        f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE key IN ({placeholders})", batch_keys
+                    ).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)",
+                    rows.values()
+                )
+                self._add_bytes(sum(row[2] for row in rows.values()) - replaced_bytes)
+                self._evict()
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the total size is below max_bytes (within the caller's transaction)"""
+        if not self.max_bytes:
+            return
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale_keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM embeddings ORDER BY last_access ASC"):
+            stale_keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", stale_keys)
+        self._add_bytes(-freed)
+
+    def stats(self) -> dict:
+        """Hit/miss counters of this process plus the current size of the cache"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            size = self._total_bytes()
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': entries,
+            'bytes': size,
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        return (f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate'] * 100:.1f}% hit rate), {stats['entries']} entries, "
+                f"{stats['bytes'] / 1024 ** 2:.1f} MB")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryEmbeddingCache:
+    """
+    In-process LRU of recent embeddings (e.g. repeated query texts of a long-running server),
+    checked before the on-disk cache. Holds at most max_entries vectors.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: str, text: str):
+        key = text_key(model, text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, model: str, text: str, vector: list) -> None:
+        key = text_key(model, text)
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_default_cache = None
+
+
+def get_default_cache():
+    """
+    Process wide cache configured from the environment.
+    Returns None when caching is disabled with EMBEDDING_CACHE_PATH="" (empty).
+    """
+    global _default_cache
+    path = os.environ.get("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+    if not path:
+        return None
+    if _default_cache is None:
+        max_bytes = int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+        _default_cache = EmbeddingCache(path, max_bytes=max_bytes)
+    return _default_cache
@@ -0,0 +1,101 @@
+import numpy as np
+
+# Local evaluation of Pinecone metadata filters (built by utils.metadata_filter), used by the local index
+RANGE_OPERATORS = ('$gt', '$gte', '$lt', '$lte')
+
+
+class FieldIndex:
+    """
+    Index of one metadata field over the rows of a namespace.
+    Categorical values (strings, booleans, list items) map to sorted row arrays, numbers are kept as a sorted
+    array with their rows, so an equality is a dict lookup and a range two binary searches.
+    Conditions come back as boolean masks over all rows (bitmaps), combined with & and |.
+    """
+
+    def __init__(self, values):
+        rows_by_value = {}
+        numeric_rows = []
+        numeric_values = []
+        present = []
+        for row, value in enumerate(values):
+            if value is None:
+                continue
+            present.append(row)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                numeric_rows.append(row)
+                numeric_values.append(value)
+            elif isinstance(value, list):
+                for item in value:
+                    rows_by_value.setdefault(item, []).append(row)
+            else:
+                rows_by_value.setdefault(value, []).append(row)
+
+        self.n_rows = len(values)
+        self.rows_by_value = {value: np.array(rows, dtype=np.int64) for value, rows in rows_by_value.items()}
+        order = np.argsort(np.array(numeric_values, dtype=np.float64), kind='stable')
+        self.sorted_values = np.array(numeric_values, dtype=np.float64)[order]
+        self.sorted_rows = np.array(numeric_rows, dtype=np.int64)[order]
+        self.present = np.array(present, dtype=np.int64)
+
+    def _mask(self, rows) -> np.ndarray:
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def _numeric_range(self, low=-np.inf, high=np.inf, low_side='left', high_side='right') -> np.ndarray:
+        start = np.searchsorted(self.sorted_values, low, side=low_side)
+        stop = np.searchsorted(self.sorted_values, high, side=high_side)
+        return self.sorted_rows[start:stop]
+
+    def _equal_rows(self, value) -> np.ndarray:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return self._numeric_range(value, value)
+        return self.rows_by_value.get(value, self.present[:0])
+
+    def mask(self, operator: str, operand) -> np.ndarray:
+        """Rows satisfying `field <operator> operand`"""
+        if operator == '$eq':
+            return self._mask(self._equal_rows(operand))
+        if operator == '$in':
+            return self._mask(np.concatenate([self.present[:0]] + [self._equal_rows(value) for value in operand]))
+        # Rows without the field never match, as in Pinecone
+        if operator == '$ne':
+            return self._mask(self.present) & ~self.mask('$eq', operand)
+        if operator == '$nin':
+            return self._mask(self.present) & ~self.mask('$in', operand)
+        if operator == '$exists':
+            return self._mask(self.present) if operand else ~self._mask(self.present)
+        if operator in RANGE_OPERATORS:
+            if operator == '$gt':
+                return self._mask(self._numeric_range(low=operand, low_side='right'))
+            if operator == '$gte':
+                return self._mask(self._numeric_range(low=operand))
+            if operator == '$lt':
+                return self._mask(self._numeric_range(high=operand, high_side='left'))
+            return self._mask(self._numeric_range(high=operand))
+        raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+def filter_mask(metadata_filter: dict, field_index, n_rows: int) -> np.ndarray:
+    """
+    Boolean mask of the rows matching a Pinecone metadata filter.
+    field_index(field) returns the FieldIndex of a field (built once and cached by the caller).
+    """
+    mask = np.ones(n_rows, dtype=bool)
+    for key, condition in metadata_filter.items():
+        if key == '$and':
+            for sub_filter in condition:
+                mask &= filter_mask(sub_filter, field_index, n_rows)
+        elif key == '$or':
+            any_mask = np.zeros(n_rows, dtype=bool)
+            for sub_filter in condition:
+                any_mask |= filter_mask(sub_filter, field_index, n_rows)
+            mask &= any_mask
+        else:
+            # A bare value is shorthand for $eq
+            if not isinstance(condition, dict):
+                condition = {'$eq': condition}
+            index = field_index(key)
+            for operator, operand in condition.items():
+                mask &= index.mask(operator, operand)
+    return mask
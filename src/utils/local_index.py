@@ -0,0 +1,370 @@
+import atexit
+import json
+import os
+import threading
+
+import numpy as np
+
+from utils.field_index import FieldIndex, filter_mask
+from utils.metrics import metrics
+from utils.quantization import load_quantized, matrix_scores, remove_quantized, write_quantized
+from utils.scoring import group_by_parent, pool_chunk_scores
+
+# Layout of one namespace on disk:
+#   <root>/<namespace>/vectors.f32     row-major float32 matrix, L2-normalised rows
+#   <root>/<namespace>/ids.json        vector id of each row
+#   <root>/<namespace>/metadata.json   metadata dict of each row
+#   <root>/<namespace>/info.json       dimension and number of rows
+# and, with quantization='int8', a compressed copy of the matrix used for scanning:
+#   <root>/<namespace>/vectors.i8      row-major int8 codes
+#   <root>/<namespace>/scales.npy      per-row scale   (value ~= code * scale + offset)
+#   <root>/<namespace>/offsets.npy     per-row offset
+
+
+class LocalNamespace:
+    """
+    Memory-mapped embedding matrix and id map of a single namespace.
+    quantization='int8' scans an in-memory int8 copy of the matrix (4x smaller than float32);
+    with rescore_factor > 0 the top_k * rescore_factor best rows are then rescored with the float32 vectors.
+    """
+
+    def __init__(self, path: str, quantization: str = 'none', rescore_factor: int = 4):
+        self.path = path
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.vectors_path = os.path.join(path, 'vectors.f32')
+        self.dimension = None
+        self.ids = []
+        self.metadata = []
+        self.id_to_row = {}
+        self._matrix = None
+        self._quantized = None
+        self._parent_groups = None
+        # Per-field indexes of the metadata, built on first use by a query filter
+        self._field_indexes = {}
+        self._dirty = False
+        # Guards the lazily built int8 copy, chunk groups and field indexes when queries run on several threads
+        self._build_lock = threading.Lock()
+
+        info_path = os.path.join(path, 'info.json')
+        if os.path.exists(info_path):
+            with open(info_path, 'r') as f:
+                info = json.load(f)
+            self.dimension = info['dimension']
+            with open(os.path.join(path, 'ids.json'), 'r') as f:
+                self.ids = json.load(f)
+            with open(os.path.join(path, 'metadata.json'), 'r', encoding='utf-8') as f:
+                self.metadata = json.load(f)
+            self.id_to_row = {vector_id: row for row, vector_id in enumerate(self.ids)}
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """(rows, dimension) float32 matrix, memory-mapped from disk"""
+        if self._matrix is None:
+            if not self.ids:
+                return np.zeros((0, self.dimension or 0), dtype=np.float32)
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                     shape=(len(self.ids), self.dimension))
+        return self._matrix
+
+    @property
+    def search_matrix(self):
+        """Matrix scanned by queries: the float32 memory map, or its int8 copy with quantization='int8'"""
+        if self.quantization != 'int8' or not self.ids:
+            return self.matrix
+        with self._build_lock:
+            if self._quantized is None:
+                self._quantized = load_quantized(self.path, len(self.ids), self.dimension)
+                if self._quantized is None:
+                    # Missing, or removed because the float32 matrix was written since (see remove_quantized)
+                    write_quantized(self.matrix, self.path)
+                    self._quantized = load_quantized(self.path, len(self.ids), self.dimension)
+        return self._quantized
+
+    def upsert(self, vectors: list) -> int:
+        if not vectors:
+            return 0
+        n_vectors = len(vectors)
+        # An id repeated within the batch keeps its last vector, as separate upserts would;
+        # otherwise both copies would be appended as rows
+        last_positions = {vector['id']: position for position, vector in enumerate(vectors)}
+        if len(last_positions) < n_vectors:
+            vectors = [vectors[position] for position in sorted(last_positions.values())]
+        values = np.asarray([vector['values'] for vector in vectors], dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = values.shape[1]
+            os.makedirs(self.path, exist_ok=True)
+        elif values.shape[1] != self.dimension:
+            raise ValueError(f"Vector dimension {values.shape[1]} does not match index dimension {self.dimension}")
+
+        # Rows are normalised once at write time so a query is a single matrix-vector product
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        values = values / np.where(norms == 0, 1, norms)
+
+        # Drop the memory map before writing so the file can be extended, and the int8 copy it makes stale
+        self._matrix = None
+        self._quantized = None
+        remove_quantized(self.path)
+        self._parent_groups = None
+        self._field_indexes = {}
+        appended = []
+        with open(self.vectors_path, 'r+b' if os.path.exists(self.vectors_path) else 'wb') as f:
+            for vector, row_values in zip(vectors, values):
+                row = self.id_to_row.get(vector['id'])
+                if row is None:
+                    appended.append((vector, row_values))
+                    continue
+                # Existing id: overwrite the row in place
+                f.seek(row * self.dimension * 4)
+                f.write(row_values.tobytes())
+                self.metadata[row] = vector.get('metadata', {})
+            f.seek(len(self.ids) * self.dimension * 4)
+            for vector, row_values in appended:
+                self.id_to_row[vector['id']] = len(self.ids)
+                self.ids.append(vector['id'])
+                self.metadata.append(vector.get('metadata', {}))
+                f.write(row_values.tobytes())
+        self._dirty = True
+        return n_vectors
+
+    def delete(self, ids: list) -> None:
+        rows = {self.id_to_row[vector_id] for vector_id in ids if vector_id in self.id_to_row}
+        if not rows:
+            return
+        keep = np.array([row for row in range(len(self.ids)) if row not in rows], dtype=np.int64)
+
+        # Compact the matrix into a new file, block by block to keep memory bounded
+        matrix = self.matrix
+        tmp_path = self.vectors_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            for start in range(0, len(keep), 65536):
+                f.write(np.ascontiguousarray(matrix[keep[start:start + 65536]]).tobytes())
+        self._matrix = None
+        self._quantized = None
+        self._parent_groups = None
+        self._field_indexes = {}
+        del matrix
+        remove_quantized(self.path)
+        os.replace(tmp_path, self.vectors_path)
+
+        self.ids = [self.ids[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self.id_to_row = {vector_id: row for row, vector_id in enumerate(self.ids)}
+        self._dirty = True
+
+    @property
+    def parent_groups(self):
+        """(parent RFP ids, parent position of every row) of a chunked namespace"""
+        with self._build_lock:
+            if self._parent_groups is None:
+                self._parent_groups = group_by_parent(self.ids)
+        return self._parent_groups
+
+    def field_index(self, field: str) -> FieldIndex:
+        """Index of one metadata field (value -> rows, sorted numeric values)"""
+        with self._build_lock:
+            if field not in self._field_indexes:
+                self._field_indexes[field] = FieldIndex([metadata.get(field) for metadata in self.metadata])
+            return self._field_indexes[field]
+
+    def filter_rows(self, metadata_filter: dict = None):
+        """Sorted rows matching a Pinecone metadata filter, None without a filter (every row)"""
+        if not metadata_filter:
+            return None
+        return np.flatnonzero(filter_mask(metadata_filter, self.field_index, len(self.ids)))
+
+    @staticmethod
+    def _normalize_query(vector: list) -> np.ndarray:
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        return query / norm if norm else query
+
+    @staticmethod
+    def _rows_of(positions: np.ndarray, rows=None) -> np.ndarray:
+        """Matrix rows of positions in a score array computed over rows (None: every row)"""
+        return positions if rows is None else rows[positions]
+
+    def scores(self, vector: list, rows=None) -> np.ndarray:
+        """
+        Cosine similarity of the query with every row, or only with the given rows
+        (approximate with quantization='int8')
+        """
+        return matrix_scores(self.search_matrix, self._normalize_query(vector), rows=rows)
+
+    def _rescore(self, scores: np.ndarray, vector: list, n_candidates: int, rows=None) -> np.ndarray:
+        """Replace the approximate scores of the n_candidates best rows by their float32 scores"""
+        if self.quantization != 'int8' or self.rescore_factor <= 0:
+            return scores
+        n_candidates = min(n_candidates, scores.shape[0])
+        positions = np.sort(np.argpartition(-scores, n_candidates - 1)[:n_candidates])
+        # Only the candidate rows of the float32 memory map are read from disk
+        rescored = np.full_like(scores, -np.inf)
+        rescored[positions] = (np.asarray(self.matrix[self._rows_of(positions, rows)], dtype=np.float32)
+                               @ self._normalize_query(vector))
+        return rescored
+
+    def query_parents(self, vector: list, top_k: int, pooling: str = 'max', top_m: int = 3,
+                      include_metadata: bool = False, metadata_filter: dict = None) -> list:
+        """Score every chunk, pool the chunk scores per parent RFP, and return the top_k parents"""
+        if not self.ids:
+            return []
+        parents, group_index = self.parent_groups
+        rows = self.filter_rows(metadata_filter)
+        if rows is not None:
+            # Only the chunks passing the filter are scored, pooled over the parents they belong to
+            groups, group_index = np.unique(group_index[rows], return_inverse=True)
+            parents = [parents[group] for group in groups]
+            if not parents:
+                return []
+        scores = self.scores(vector, rows)
+        pooled, best_positions = pool_chunk_scores(scores, group_index, len(parents), pooling, top_m)
+        top_k = min(top_k, len(parents))
+        if self.quantization == 'int8' and self.rescore_factor > 0:
+            # Rescore every chunk of the candidate parents, then pool again
+            n_candidates = min(top_k * self.rescore_factor, len(parents))
+            candidate_groups = np.argpartition(-pooled, n_candidates - 1)[:n_candidates]
+            positions = np.flatnonzero(np.isin(group_index, candidate_groups))
+            scores = np.full_like(scores, -np.inf)
+            scores[positions] = (np.asarray(self.matrix[self._rows_of(positions, rows)], dtype=np.float32)
+                                 @ self._normalize_query(vector))
+            pooled, best_positions = pool_chunk_scores(scores, group_index, len(parents), pooling, top_m)
+        candidates = np.argpartition(-pooled, top_k - 1)[:top_k]
+        order = candidates[np.argsort(-pooled[candidates], kind='stable')]
+        best_rows = self._rows_of(best_positions, rows)
+
+        matches = []
+        for group in order:
+            match = {'id': parents[group], 'score': float(pooled[group])}
+            if include_metadata:
+                match['metadata'] = self.metadata[best_rows[group]]
+            matches.append(match)
+        return matches
+
+    def query(self, vector: list, top_k: int, include_metadata: bool = False, metadata_filter: dict = None) -> list:
+        if self.matrix.shape[0] == 0:
+            return []
+        # With a filter only the candidate rows take part in the similarity computation
+        rows = self.filter_rows(metadata_filter)
+        scores = self.scores(vector, rows)
+        if scores.shape[0] == 0:
+            return []
+        top_k = min(top_k, scores.shape[0])
+        scores = self._rescore(scores, vector, top_k * self.rescore_factor, rows)
+        if top_k < scores.shape[0]:
+            # Partial selection of the top-k rows, then sort only those
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(scores.shape[0])
+        order = candidates[np.argsort(-scores[candidates], kind='stable')]
+
+        matches = []
+        for position, row in zip(order, self._rows_of(order, rows)):
+            match = {'id': self.ids[row], 'score': float(scores[position])}
+            if include_metadata:
+                match['metadata'] = self.metadata[row]
+            matches.append(match)
+        return matches
+
+    def list_ids(self, prefix: str = None, limit: int = 100, start: int = 0):
+        """(up to limit ids starting with prefix from row start on, row to continue from or None at the end)"""
+        ids = []
+        row = start
+        while row < len(self.ids) and len(ids) < limit:
+            if not prefix or self.ids[row].startswith(prefix):
+                ids.append(self.ids[row])
+            row += 1
+        return ids, (row if row < len(self.ids) else None)
+
+    def fetch(self, ids: list) -> dict:
+        """{id: vector dict} of the ids present in the namespace"""
+        found = [(vector_id, self.id_to_row[vector_id]) for vector_id in ids if vector_id in self.id_to_row]
+        if not found:
+            return {}
+        values = self.matrix[np.array([row for _, row in found])]
+        return {vector_id: {'id': vector_id, 'values': row_values.tolist(), 'metadata': self.metadata[row]}
+                for (vector_id, row), row_values in zip(found, values)}
+
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+        with open(os.path.join(self.path, 'ids.json'), 'w') as f:
+            json.dump(self.ids, f)
+        with open(os.path.join(self.path, 'metadata.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.metadata, f, ensure_ascii=False)
+        with open(os.path.join(self.path, 'info.json'), 'w') as f:
+            json.dump({'dimension': self.dimension, 'count': len(self.ids)}, f)
+        if self.quantization == 'int8' and self.ids:
+            write_quantized(self.matrix, self.path)
+            self._quantized = None
+        self._dirty = False
+
+
+class LocalIndex:
+    """
+    Exact vector search over memory-mapped float32 matrices (or their int8 copies, see LocalNamespace).
+    Exposes the subset of the Pinecone Index interface used by the scripts (upsert / query / delete / fetch /
+    list_paginated / describe_index_stats),
+    so it can be passed anywhere a Pinecone index is expected.
+    """
+
+    def __init__(self, root: str, quantization: str = 'none', rescore_factor: int = 4):
+        self.root = root
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self._namespaces = {}
+        # Upserts may come from several ingest threads
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def namespace(self, namespace: str = '') -> LocalNamespace:
+        name = namespace or '__default__'
+        if name not in self._namespaces:
+            self._namespaces[name] = LocalNamespace(os.path.join(self.root, name), self.quantization,
+                                                   self.rescore_factor)
+        return self._namespaces[name]
+
+    def upsert(self, vectors: list, namespace: str = '') -> dict:
+        with metrics.timer('local_index.upsert'), self._lock:
+            upserted_count = self.namespace(namespace).upsert(vectors)
+        return {'upserted_count': upserted_count}
+
+    def delete(self, ids: list, namespace: str = '') -> dict:
+        with metrics.timer('local_index.delete'), self._lock:
+            self.namespace(namespace).delete(ids)
+        return {}
+
+    def query(self, vector: list, top_k: int, namespace: str = '', include_metadata: bool = False,
+              filter: dict = None, **kwargs) -> dict:
+        with metrics.timer('local_index.query'):
+            matches = self.namespace(namespace).query(vector, top_k, include_metadata=include_metadata,
+                                                      metadata_filter=filter)
+        return {'matches': matches, 'namespace': namespace}
+
+    def list_paginated(self, prefix: str = None, limit: int = 100, pagination_token: str = None,
+                       namespace: str = '') -> dict:
+        """Page of vector ids in the shape of Pinecone's list_paginated (the token is a row offset)"""
+        with self._lock:
+            ids, next_row = self.namespace(namespace).list_ids(prefix, limit, int(pagination_token or 0))
+        return {'vectors': [{'id': vector_id} for vector_id in ids],
+                'pagination': {'next': str(next_row)} if next_row is not None else None, 'namespace': namespace}
+
+    def fetch(self, ids: list, namespace: str = '') -> dict:
+        with metrics.timer('local_index.fetch'), self._lock:
+            vectors = self.namespace(namespace).fetch(ids)
+        return {'vectors': vectors, 'namespace': namespace}
+
+    def describe_index_stats(self) -> dict:
+        """Vector count of each namespace on disk or in memory, in the shape of Pinecone's describe_index_stats"""
+        names = set(self._namespaces)
+        if os.path.isdir(self.root):
+            names.update(name for name in os.listdir(self.root)
+                         if os.path.exists(os.path.join(self.root, name, 'info.json')))
+        with self._lock:
+            counts = {name: len(self.namespace(name).ids) for name in names}
+        namespaces = {('' if name == '__default__' else name): {'vector_count': count}
+                      for name, count in counts.items() if count}
+        return {'namespaces': namespaces, 'total_vector_count': sum(counts.values())}
+
+    def flush(self) -> None:
+        for local_namespace in self._namespaces.values():
+            local_namespace.flush()
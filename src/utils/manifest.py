@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+
+
+MANIFEST_DIR = '../../datasets/manifests'
+
+
+def default_manifest_path(index_key: str, namespace: str) -> str:
+    """Ingest manifest location of a namespace; index_key (utils.backends.index_key) tells backends apart"""
+    return os.path.join(MANIFEST_DIR, f"{index_key}__{namespace}.json")
+
+
+def record_hash(description: str, metadata: dict) -> str:
+    """Hash of everything that ends up in a vector: the embedded text and its metadata"""
+    payload = json.dumps({'description': description, 'metadata': metadata}, sort_keys=True,
+                         ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class IngestManifest:
+    """
+    Local record of what has been upserted to an index namespace: vector id -> content hash.
+    Lets re-runs skip unchanged records and find ids that disappeared from the dataset.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.hashes = {}
+        self.seen = set()
+        self.changed = 0
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.hashes = json.load(f)
+
+    def is_changed(self, vector_id: str, content_hash: str) -> bool:
+        """Mark the id as present in the dataset and tell whether it has to be (re-)embedded"""
+        self.seen.add(vector_id)
+        if self.hashes.get(vector_id) == content_hash:
+            return False
+        self.hashes[vector_id] = content_hash
+        self.changed += 1
+        return True
+
+    def removed_ids(self) -> list:
+        """Ids stored by a previous run that were not seen in this run"""
+        return [vector_id for vector_id in self.hashes if vector_id not in self.seen]
+
+    def reset(self) -> None:
+        """Forget every stored hash, so all records of the run count as new"""
+        self.hashes = {}
+
+    def forget(self, vector_ids: list) -> None:
+        for vector_id in vector_ids:
+            self.hashes.pop(vector_id, None)
+
+    def save(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.hashes, f)
+        os.replace(tmp_path, self.path)
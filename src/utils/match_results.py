@@ -0,0 +1,89 @@
+import json
+import os
+
+from utils.utils import iter_jsonl
+
+# One row per match: the skill set (its id and 1-based position in the skill sets file), the rank and the RFP
+RESULT_FIELDS = ('skill_set_id', 'skill_set_index', 'rank', 'postingId', 'score')
+RESULT_FORMATS = ('jsonl', 'parquet')
+
+
+def result_format(path: str, output_format: str = None) -> str:
+    """Explicit format, else inferred from the file extension (.parquet, anything else is JSONL)"""
+    if output_format:
+        return output_format
+    return 'parquet' if path.endswith('.parquet') else 'jsonl'
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Parquet results need pyarrow (pip install pyarrow), or use JSONL output") from e
+    return pyarrow
+
+
+class MatchResultWriter:
+    """
+    Buffered writer of match rows to JSONL or Parquet (zstd).
+    The file is written under a temporary name and replaces the previous results on close,
+    so a re-run never appends to old output and a failed run leaves the previous file intact.
+    """
+
+    def __init__(self, path: str, output_format: str = None, buffer_size: int = 1024 ** 2):
+        self.path = path
+        self.format = result_format(path, output_format)
+        self.tmp_path = path + '.tmp'
+        self.rows = 0
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        if self.format == 'parquet':
+            _import_pyarrow()
+            self._columns = {field: [] for field in RESULT_FIELDS}
+            self._file = None
+        else:
+            self._file = open(self.tmp_path, 'w', encoding='utf-8', buffering=buffer_size)
+
+    def write(self, rows) -> None:
+        for row in rows:
+            if self._file is not None:
+                self._file.write(json.dumps({field: row[field] for field in RESULT_FIELDS}, ensure_ascii=False) + '\n')
+            else:
+                for field in RESULT_FIELDS:
+                    self._columns[field].append(row[field])
+            self.rows += 1
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        else:
+            pyarrow = _import_pyarrow()
+            # Skill set ids may be ints or strings depending on the file, store them as strings
+            self._columns['skill_set_id'] = [str(value) for value in self._columns['skill_set_id']]
+            pyarrow.parquet.write_table(pyarrow.table(self._columns), self.tmp_path, compression='zstd')
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def read_match_results(path: str, output_format: str = None) -> list:
+    """Match rows written by MatchResultWriter"""
+    if result_format(path, output_format) == 'parquet':
+        pyarrow = _import_pyarrow()
+        return pyarrow.parquet.read_table(path).to_pylist()
+    return list(iter_jsonl(path))
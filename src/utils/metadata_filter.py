@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+from utils.metadata_schema import TIMESTAMP_FIELDS, to_timestamp
+
+# Filters use Pinecone's metadata filter language, so the same dict is sent to Pinecone and evaluated locally
+# (utils.field_index). Dates are compared through their numeric copy (Pinecone range operators only take numbers).
+CREATED_AT_FIELD = TIMESTAMP_FIELDS['created_at']
+
+
+def add_filter_arguments(parser):
+    """Register the metadata filter options shared by the matching scripts"""
+    parser.add_argument('--status', type=str, nargs='+', default=None,
+                        help='Only match RFPs with one of these statuses (e.g. active)')
+    parser.add_argument('--department', type=str, nargs='+', default=None,
+                        help='Only match RFPs of one of these departments')
+    parser.add_argument('--since', type=str, default=None,
+                        help='Only match RFPs created on or after this date (YYYY-MM-DD or ISO 8601)')
+    parser.add_argument('--until', type=str, default=None,
+                        help='Only match RFPs created before this date (YYYY-MM-DD or ISO 8601)')
+    parser.add_argument('--last_days', type=int, default=None,
+                        help='Only match RFPs created in the last N days (instead of --since)')
+
+
+def _date_argument(name: str, value: str) -> int:
+    timestamp = to_timestamp(value)
+    if timestamp is None:
+        raise ValueError(f"Invalid --{name} date: {value}")
+    return timestamp
+
+
+def filter_from_args(args):
+    """Pinecone metadata filter of the filter options, None when no option is set"""
+    metadata_filter = {}
+    if args.status:
+        metadata_filter['status'] = {'$in': list(args.status)}
+    if args.department:
+        metadata_filter['department'] = {'$in': list(args.department)}
+
+    created_at = {}
+    if args.last_days is not None:
+        since = datetime.now(timezone.utc) - timedelta(days=args.last_days)
+        created_at['$gte'] = int(since.timestamp())
+    elif args.since:
+        created_at['$gte'] = _date_argument('since', args.since)
+    if args.until:
+        created_at['$lt'] = _date_argument('until', args.until)
+    if created_at:
+        metadata_filter[CREATED_AT_FIELD] = created_at
+    return metadata_filter or None
@@ -0,0 +1,54 @@
+from datetime import datetime, timezone
+
+# Metadata stored with each vector: only the fields queries filter on. Display fields (title, URLs, POCs, addresses...)
+# are read from the dataset for the final matches (utils.record_store), instead of riding along in every upsert
+# and query response.
+DEFAULT_METADATA_FIELDS = ('postingId', 'status', 'department', 'created_at')
+# Always kept on chunk vectors, the query side pools chunks per parent RFP
+CHUNK_METADATA_FIELDS = ('parent_id', 'chunk_index')
+# Pinecone range filters ($gte / $lte) only compare numbers, so dates are also stored as epoch seconds
+TIMESTAMP_FIELDS = {'created_at': 'created_at_ts'}
+ALL_FIELDS = 'all'
+
+
+def add_metadata_arguments(parser):
+    """Register the metadata schema option of the ingest script"""
+    parser.add_argument('--metadata_fields', type=str, default=','.join(DEFAULT_METADATA_FIELDS),
+                        help=f"Comma separated record fields stored as vector metadata ('{ALL_FIELDS}': every field)")
+
+
+def parse_metadata_fields(value: str):
+    """--metadata_fields value -> tuple of fields, None to keep every field"""
+    if value.strip() == ALL_FIELDS:
+        return None
+    return tuple(field.strip() for field in value.split(',') if field.strip())
+
+
+def to_timestamp(value):
+    """Epoch seconds of an ISO 8601 date (naive dates are taken as UTC), None if it cannot be parsed"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+
+def project_metadata(metadata: dict, fields) -> dict:
+    """Keep the schema fields of a record's metadata (fields=None keeps all) and add the numeric date fields"""
+    if fields is None:
+        projected = dict(metadata)
+    else:
+        projected = {field: metadata[field] for field in fields + CHUNK_METADATA_FIELDS
+                     if field in metadata and metadata[field] is not None}
+    for field, timestamp_field in TIMESTAMP_FIELDS.items():
+        if field in projected:
+            timestamp = to_timestamp(projected[field])
+            if timestamp is not None:
+                projected[timestamp_field] = timestamp
+    return projected
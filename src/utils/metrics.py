@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEFAULT_METRICS_DIR = '../../results/metrics'
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus style)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot: above the largest bucket
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (the maximum for the overflow bucket)"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum_seconds': round(self.sum, 6),
+            'mean_seconds': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50_seconds': round(self.quantile(0.5), 6),
+            'p95_seconds': round(self.quantile(0.95), 6),
+            'max_seconds': round(self.max, 6),
+            'buckets': {str(bound): count for bound, count in zip(self.buckets, self.counts)},
+            'overflow': self.counts[-1],
+        }
+
+
+class Metrics:
+    """
+    Process-wide run metrics: stage wall times, per-call latency histograms, API token usage and event counters
+    (retries, errors, ...). Thread safe; timers can also wrap awaits in async code.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.stages = {}
+        self.histograms = {}
+        self.counters = {}
+        self.tokens = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        """Wall time of a pipeline stage (accumulated if the stage runs several times)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    @contextmanager
+    def timer(self, name: str):
+        """Latency of one call; a raised exception also counts as '<name>.errors'"""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.increment(f"{name}.errors")
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(seconds)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_usage(self, name: str, usage) -> None:
+        """Add the token counts of an API response's `usage` field"""
+        if usage is None:
+            return
+        with self._lock:
+            totals = self.tokens.setdefault(name, {})
+            for field in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+                value = getattr(usage, field, None)
+                if value is None and isinstance(usage, dict):
+                    value = usage.get(field)
+                if value:
+                    totals[field] = totals.get(field, 0) + value
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'wall_seconds': round(time.time() - self.started, 6),
+                'stages': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+                'latency': {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+                'tokens': {name: dict(totals) for name, totals in self.tokens.items()},
+                'counters': dict(self.counters),
+            }
+
+    def to_prometheus(self, run: str) -> str:
+        """Metrics in the Prometheus text exposition format (for the node_exporter textfile collector)"""
+        lines = ['# TYPE rfp_run_wall_seconds gauge',
+                 f'rfp_run_wall_seconds{{run="{run}"}} {time.time() - self.started:.6f}',
+                 '# TYPE rfp_stage_seconds gauge']
+        with self._lock:
+            for name, seconds in self.stages.items():
+                lines.append(f'rfp_stage_seconds{{run="{run}",stage="{name}"}} {seconds:.6f}')
+            lines.append('# TYPE rfp_call_latency_seconds histogram')
+            for name, histogram in self.histograms.items():
+                labels = f'run="{run}",call="{name}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'rfp_call_latency_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'rfp_call_latency_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                lines.append(f'rfp_call_latency_seconds_sum{{{labels}}} {histogram.sum:.6f}')
+                lines.append(f'rfp_call_latency_seconds_count{{{labels}}} {histogram.count}')
+            lines.append('# TYPE rfp_tokens_total counter')
+            for name, totals in self.tokens.items():
+                for field, value in totals.items():
+                    kind = field.replace('_tokens', '')
+                    lines.append(f'rfp_tokens_total{{run="{run}",call="{name}",kind="{kind}"}} {value}')
+            lines.append('# TYPE rfp_events_total counter')
+            for name, value in self.counters.items():
+                lines.append(f'rfp_events_total{{run="{run}",event="{name}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared by every module of a run
+metrics = Metrics()
+
+
+def add_metrics_arguments(parser):
+    """Register the metrics output options shared by all scripts"""
+    parser.add_argument('--metrics_json', type=str, default=None,
+                        help=f'Metrics file written at the end of the run (default: {DEFAULT_METRICS_DIR}/<script>_<timestamp>.json)')
+    parser.add_argument('--metrics_prom', type=str, default=None,
+                        help='Also write the metrics as a Prometheus textfile (e.g. for the node_exporter textfile collector)')
+
+
+def _write_atomic(path: str, content: str) -> None:
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def write_run_metrics(run: str, json_path: str = None, prometheus_path: str = None) -> str:
+    """Write the metrics of this run as JSON (and optionally as a Prometheus textfile); returns the JSON path"""
+    json_path = json_path or os.path.join(DEFAULT_METRICS_DIR, f"{run}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    _write_atomic(json_path, json.dumps(dict(run=run, **metrics.to_dict()), indent=2))
+    if prometheus_path:
+        _write_atomic(prometheus_path, metrics.to_prometheus(run))
+    print(f"Metrics saved to {json_path}")
+    return json_path
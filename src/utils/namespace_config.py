@@ -0,0 +1,37 @@
+import json
+import os
+
+# Per-namespace embedding settings (project root /datasets), written at ingest time and read by the query scripts.
+# Namespaces are grouped by index key (utils.backends.index_key): {"<index key>": {"<namespace>": {...}}}, so indexes
+# and backends that reuse a namespace name keep their own settings
+DEFAULT_NAMESPACE_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'datasets', 'namespaces.json')
+
+
+def _config_path() -> str:
+    return os.environ.get("NAMESPACE_CONFIG_PATH") or DEFAULT_NAMESPACE_CONFIG_PATH
+
+
+def load_namespace_config() -> dict:
+    path = _config_path()
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def namespace_dimensions(index_key: str, namespace: str):
+    """Embedding dimensions of a namespace of an index, None for the model's full dimension"""
+    return load_namespace_config().get(index_key, {}).get(namespace, {}).get('dimensions')
+
+
+def set_namespace_dimensions(index_key: str, namespace: str, dimensions) -> None:
+    config = load_namespace_config()
+    config.setdefault(index_key, {}).setdefault(namespace, {})['dimensions'] = dimensions
+    path = _config_path()
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(config, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+
+
+def quantize_rows(block: np.ndarray):
+    """
+    Per-row int8 quantization with a scale and an offset: x ~= code * scale + offset.
+    Returns (int8 codes, float32 scales, float32 offsets).
+    """
+    block = np.asarray(block, dtype=np.float32)
+    mins = block.min(axis=1)
+    maxs = block.max(axis=1)
+    scales = (maxs - mins) / 255
+    scales[scales == 0] = 1
+    codes = np.round((block - mins[:, None]) / scales[:, None]) - 128
+    offsets = mins + 128 * scales
+    return np.clip(codes, -128, 127).astype(np.int8), scales.astype(np.float32), offsets.astype(np.float32)
+
+
+class QuantizedMatrix:
+    """
+    Read-only int8 matrix that dequantizes on slicing.
+    Slicing returns float32 rows, so it can be used wherever the float32 memory map is used.
+    """
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray, offsets: np.ndarray):
+        self.codes = codes
+        self.scales = scales
+        self.offsets = offsets
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes + self.offsets.nbytes
+
+    def __getitem__(self, rows) -> np.ndarray:
+        return self.codes[rows].astype(np.float32) * self.scales[rows, None] + self.offsets[rows, None]
+
+
+def quantized_paths(directory: str):
+    return (os.path.join(directory, 'vectors.i8'),
+            os.path.join(directory, 'scales.npy'),
+            os.path.join(directory, 'offsets.npy'))
+
+
+def write_quantized(matrix, directory: str, block_size: int = 65536) -> None:
+    """Quantize a (memory-mapped) float32 matrix block by block into the int8 files of directory"""
+    codes_path, scales_path, offsets_path = quantized_paths(directory)
+    scales = np.empty(matrix.shape[0], dtype=np.float32)
+    offsets = np.empty(matrix.shape[0], dtype=np.float32)
+    with open(codes_path, 'wb') as f:
+        for start in range(0, matrix.shape[0], block_size):
+            codes, block_scales, block_offsets = quantize_rows(matrix[start:start + block_size])
+            f.write(codes.tobytes())
+            scales[start:start + codes.shape[0]] = block_scales
+            offsets[start:start + codes.shape[0]] = block_offsets
+    np.save(scales_path, scales)
+    np.save(offsets_path, offsets)
+
+
+def remove_quantized(directory: str) -> None:
+    """
+    Delete the int8 files of directory. Called before the float32 matrix is written: codes of the same size
+    would otherwise pass for current after an in-place update.
+    """
+    for path in quantized_paths(directory):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def load_quantized(directory: str, rows: int, dimension: int):
+    """Load the int8 matrix of directory, or None if it is missing or out of date"""
+    codes_path, scales_path, offsets_path = quantized_paths(directory)
+    if not all(os.path.exists(path) for path in (codes_path, scales_path, offsets_path)):
+        return None
+    if os.path.getsize(codes_path) != rows * dimension:
+        return None
+    # The int8 codes are small enough to be held in memory
+    codes = np.fromfile(codes_path, dtype=np.int8).reshape(rows, dimension)
+    return QuantizedMatrix(codes, np.load(scales_path), np.load(offsets_path))
+
+
+def matrix_scores(matrix, query: np.ndarray, block_size: int = 65536, rows=None) -> np.ndarray:
+    """
+    matrix @ query computed block by block (works for memory maps and QuantizedMatrix).
+    rows: only score these rows (the scores follow their order), e.g. the rows passing a metadata filter.
+    """
+    n_rows = matrix.shape[0] if rows is None else len(rows)
+    scores = np.empty(n_rows, dtype=np.float32)
+    for start in range(0, n_rows, block_size):
+        block_rows = slice(start, start + block_size) if rows is None else rows[start:start + block_size]
+        block = np.asarray(matrix[block_rows], dtype=np.float32)
+        scores[start:start + block.shape[0]] = block @ query
+    return scores
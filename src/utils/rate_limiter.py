@@ -0,0 +1,43 @@
+import asyncio
+import time
+
+
+class AsyncRateLimiter:
+    """
+    Token-bucket limiter for OpenAI style rate limits.
+    Two buckets refill continuously: one in requests per minute and one in tokens per minute.
+    A request waits until both buckets hold enough capacity, so throughput follows the configured limits.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_level = float(requests_per_minute)
+        self._token_level = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_level = min(self.requests_per_minute,
+                                  self._request_level + elapsed * self.requests_per_minute / 60)
+        self._token_level = min(self.tokens_per_minute,
+                                self._token_level + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait until one request and `tokens` tokens are available, then consume them"""
+        # A single request larger than the whole bucket would otherwise wait forever
+        tokens = min(tokens, self.tokens_per_minute)
+        # Waiters are served in arrival order because the lock is held while sleeping
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._request_level >= 1 and self._token_level >= tokens:
+                    self._request_level -= 1
+                    self._token_level -= tokens
+                    return
+                request_wait = max(0.0, (1 - self._request_level) * 60 / self.requests_per_minute)
+                token_wait = max(0.0, (tokens - self._token_level) * 60 / self.tokens_per_minute)
+                await asyncio.sleep(max(request_wait, token_wait))
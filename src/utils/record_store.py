@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+
+from utils.scoring import parent_id_of
+
+# orjson is an optional, much faster parser for large JSONL dumps
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    import json
+    _json_loads = json.loads
+
+
+def record_index_path(dataset_path: str) -> str:
+    """The offset index is stored next to the dataset it describes"""
+    return dataset_path + '.offsets.npz'
+
+
+def record_id(record: dict):
+    """Id of a record as used for its vectors: postingId, else the Supabase row id (None if neither)"""
+    value = record.get('postingId') or record.get('id')
+    return None if value is None or value == '' else str(value)
+
+
+def _source_signature(dataset_path: str) -> np.ndarray:
+    stat = os.stat(dataset_path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def build_record_index(dataset_path: str, index_path: str = None) -> str:
+    """
+    Scan the JSONL file once and store the byte offset and length of every record, sorted by record id.
+    A record id appearing several times (e.g. re-extracted rows appended by --incremental) maps to its last line.
+    """
+    index_path = index_path or record_index_path(dataset_path)
+    signature = _source_signature(dataset_path)
+    ids, offsets, lengths = [], [], []
+    offset = 0
+    with open(dataset_path, 'rb') as f:
+        for line in f:
+            if line.strip():
+                try:
+                    vector_id = record_id(_json_loads(line))
+                except (ValueError, AttributeError):
+                    vector_id = None
+                if vector_id is not None:
+                    ids.append(vector_id.encode('utf-8'))
+                    offsets.append(offset)
+                    lengths.append(len(line))
+            offset += len(line)
+
+    ids = np.array(ids, dtype=bytes) if ids else np.zeros(0, dtype='S1')
+    rows = np.arange(len(ids), dtype=np.int64)
+    order = np.argsort(ids, kind='stable')
+    ids, rows = ids[order], rows[order]
+    # Stable sort: the last line of a duplicated id is the last of its run
+    last = np.ones(len(ids), dtype=bool)
+    last[:-1] = ids[:-1] != ids[1:]
+    ids, rows = ids[last], rows[last]
+
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, ids=ids, rows=rows, offsets=np.asarray(offsets, dtype=np.int64)[rows],
+                 lengths=np.asarray(lengths, dtype=np.int64)[rows], source=signature)
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+class RecordStore:
+    """
+    Random access to the records of a JSONL dataset by postingId (or chunk vector id) through a byte-offset index,
+    so matches are hydrated by reading only their own lines instead of loading the whole corpus.
+    The index is (re)built when it is missing or older than the dataset.
+    """
+
+    def __init__(self, dataset_path: str, index_path: str = None):
+        self.dataset_path = dataset_path
+        self.index_path = index_path or record_index_path(dataset_path)
+        if not self._load():
+            print(f"Building the record index of {dataset_path}...")
+            build_record_index(dataset_path, self.index_path)
+            self._load()
+
+    def _load(self) -> bool:
+        if not os.path.exists(self.index_path):
+            return False
+        with np.load(self.index_path) as index:
+            if not np.array_equal(index['source'], _source_signature(self.dataset_path)):
+                return False
+            self._ids = index['ids']
+            self._rows = index['rows']
+            self._offsets = index['offsets']
+            self._lengths = index['lengths']
+        return True
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def ids(self) -> list:
+        """Record ids in file order (read from the index, the dataset is not parsed)"""
+        return [vector_id.decode('utf-8') for vector_id in self._ids[np.argsort(self._rows)].tolist()]
+
+    def _positions(self, ids: list) -> list:
+        """Index position of each id, None for unknown ids"""
+        keys = [vector_id.encode('utf-8') for vector_id in ids]
+        if not keys or not len(self._ids):
+            return [None] * len(keys)
+        positions = np.searchsorted(self._ids, np.array(keys, dtype=bytes)).tolist()
+        return [position if position < len(self._ids) and self._ids[position] == key else None
+                for position, key in zip(positions, keys)]
+
+    def __contains__(self, vector_id: str) -> bool:
+        return self._positions([str(vector_id)])[0] is not None
+
+    def get_many(self, ids: list, fields: list = None) -> dict:
+        """
+        {requested id: record} of the ids found; chunk vector ids ("<postingId>#chunk<n>") resolve to their RFP.
+        fields: only keep these keys of each record (projection), None keeps every key
+        """
+        requested = [str(vector_id) for vector_id in ids]
+        positions = self._positions([parent_id_of(vector_id) for vector_id in requested])
+        found = sorted((self._offsets[position], self._lengths[position], vector_id)
+                       for vector_id, position in zip(requested, positions) if position is not None)
+        records = {}
+        # Lines are read in file order to keep the reads sequential
+        with open(self.dataset_path, 'rb') as f:
+            for offset, length, vector_id in found:
+                f.seek(int(offset))
+                record = _json_loads(f.read(int(length)))
+                if fields is not None:
+                    record = {key: record[key] for key in fields if key in record}
+                records[vector_id] = record
+        return records
+
+    def get(self, vector_id: str, fields: list = None):
+        return self.get_many([vector_id], fields).get(str(vector_id))
@@ -0,0 +1,124 @@
+import re
+
+import numpy as np
+
+# Chunk vectors of a chunked namespace are stored as "<postingId>#chunk<n>"
+CHUNK_ID_PATTERN = re.compile(r"#chunk\d+$")
+POOLING_MODES = ('max', 'mean_top_m')
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """L2-normalise each row so that dot products are cosine similarities"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def read_block(matrix, start: int, block_size: int, rows=None) -> np.ndarray:
+    """float32 block of block_size rows from start, of the whole matrix or of the selected rows"""
+    block_rows = slice(start, start + block_size) if rows is None else rows[start:start + block_size]
+    return np.asarray(matrix[block_rows], dtype=np.float32)
+
+
+def max_scores_over_skill_sets(skill_embeddings, rfp_matrix, block_size: int = 65536, rows=None):
+    """
+    Build the (skill sets x RFPs) cosine score matrix and reduce it per RFP.
+    rfp_matrix is expected to hold L2-normalised rows (as written by the local index) and may be a memory map;
+    it is processed in blocks of rows so memory stays bounded for large corpora.
+    rows: only score these rows of rfp_matrix (e.g. the rows passing a metadata filter), results follow their order.
+    Returns (max score per RFP, index of the best matching skill set per RFP).
+    """
+    skills = normalize_rows(skill_embeddings)
+    n_rows = rfp_matrix.shape[0] if rows is None else len(rows)
+    best_scores = np.empty(n_rows, dtype=np.float32)
+    best_skill = np.empty(n_rows, dtype=np.int64)
+
+    for start in range(0, n_rows, block_size):
+        block = read_block(rfp_matrix, start, block_size, rows)
+        scores = skills @ block.T  # (skill sets, block rows)
+        best_skill[start:start + block.shape[0]] = scores.argmax(axis=0)
+        best_scores[start:start + block.shape[0]] = scores.max(axis=0)
+
+    return best_scores, best_skill
+
+
+def chunk_vector_id(parent_id: str, chunk_index: int) -> str:
+    return f"{parent_id}#chunk{chunk_index}"
+
+
+def parent_id_of(vector_id: str) -> str:
+    """postingId of a chunk vector id (unchunked ids are returned unchanged)"""
+    return CHUNK_ID_PATTERN.sub('', vector_id)
+
+
+def group_by_parent(vector_ids: list):
+    """Return (parent ids, parent position of every vector) for a list of chunk vector ids"""
+    parents, group_index = np.unique(np.array([parent_id_of(vector_id) for vector_id in vector_ids]),
+                                     return_inverse=True)
+    return parents.tolist(), group_index
+
+
+def pool_chunk_scores(scores, group_index, n_groups: int, pooling: str = 'max', top_m: int = 3):
+    """
+    Pool chunk scores into one score per parent RFP without a Python loop over chunks.
+    pooling='max' keeps the best chunk, 'mean_top_m' averages the top_m best chunks of each RFP.
+    Returns (pooled scores, row of the best chunk of each RFP).
+    """
+    scores = np.asarray(scores)
+    # Sort by parent, then by descending score, so each parent's chunks are contiguous and best-first
+    order = np.lexsort((-scores, group_index))
+    sorted_groups = group_index[order]
+    sorted_scores = scores[order]
+    starts = np.searchsorted(sorted_groups, np.arange(n_groups))
+    best_rows = order[starts]
+
+    if pooling == 'max':
+        return sorted_scores[starts], best_rows
+    if pooling != 'mean_top_m':
+        raise ValueError(f"Unknown pooling mode: {pooling}")
+
+    rank = np.arange(len(order)) - starts[sorted_groups]
+    keep = rank < top_m
+    sums = np.bincount(sorted_groups[keep], weights=sorted_scores[keep], minlength=n_groups)
+    counts = np.bincount(sorted_groups[keep], minlength=n_groups)
+    return sums / np.maximum(counts, 1), best_rows
+
+
+def aggregate_matches(matches: list, top_k: int, pooling: str = 'max', top_m: int = 3) -> list:
+    """Turn chunk matches of a query into the top_k parent RFPs with pooled scores"""
+    if not matches:
+        return []
+    parents, group_index = group_by_parent([match['id'] for match in matches])
+    pooled, best_rows = pool_chunk_scores(np.array([match['score'] for match in matches], dtype=np.float32),
+                                          group_index, len(parents), pooling, top_m)
+    order = np.argsort(-pooled, kind='stable')[:top_k]
+    results = []
+    for group in order:
+        result = {'id': parents[group], 'score': float(pooled[group])}
+        if 'metadata' in matches[best_rows[group]]:
+            result['metadata'] = matches[best_rows[group]]['metadata']
+        results.append(result)
+    return results
+
+
+def pooled_scores_over_skill_sets(skill_embeddings, rfp_matrix, group_index, n_groups: int,
+                                  pooling: str = 'max', top_m: int = 3, block_size: int = 65536, rows=None):
+    """
+    Chunked version of max_scores_over_skill_sets: chunk scores are pooled per parent RFP first.
+    With rows, group_index gives the parent position of each selected row (not of every row of rfp_matrix).
+    Returns (max pooled score per parent RFP, index of the best matching skill set per parent RFP).
+    """
+    if pooling == 'max':
+        # max over skill sets and max over chunks commute, so pool the per-chunk maxima
+        best_scores, best_skill = max_scores_over_skill_sets(skill_embeddings, rfp_matrix, block_size, rows)
+        pooled, best_rows = pool_chunk_scores(best_scores, group_index, n_groups, 'max')
+        return pooled, best_skill[best_rows]
+
+    skills = normalize_rows(skill_embeddings)
+    n_rows = rfp_matrix.shape[0] if rows is None else len(rows)
+    chunk_scores = np.empty((skills.shape[0], n_rows), dtype=np.float32)
+    for start in range(0, n_rows, block_size):
+        block = read_block(rfp_matrix, start, block_size, rows)
+        chunk_scores[:, start:start + block.shape[0]] = skills @ block.T
+    pooled = np.stack([pool_chunk_scores(row, group_index, n_groups, pooling, top_m)[0] for row in chunk_scores])
+    return pooled.max(axis=0), pooled.argmax(axis=0)
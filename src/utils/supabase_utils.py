@@ -0,0 +1,51 @@
+import json
+import os
+
+from utils.metrics import metrics
+
+
+def iter_table_rows(supabase, table: str = "data", columns: str = "*", page_size: int = 1000,
+                    created_after: str = None, key: str = "id"):
+    """
+    Stream rows of a Supabase table with keyset pagination on `key`.
+    Each page asks for rows with key greater than the last one seen, so no page is re-scanned
+    and the table is never pulled in a single response.
+    created_after: only fetch rows whose created_at is newer than this timestamp (incremental mode)
+    """
+    last_key = None
+    while True:
+        query = supabase.table(table).select(columns).order(key).limit(page_size)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        if created_after:
+            query = query.gt("created_at", created_after)
+        with metrics.timer('supabase.select'):
+            rows = query.execute().data
+        if not rows:
+            return
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_key = rows[-1][key]
+
+
+def projection_columns(columns: str, required=("id", "created_at")) -> str:
+    """Make sure the pagination key and watermark column are part of a projected select"""
+    if columns.strip() == "*":
+        return columns
+    selected = [column.strip() for column in columns.split(",") if column.strip()]
+    selected += [column for column in required if column not in selected]
+    return ",".join(selected)
+
+
+def load_watermark(path: str):
+    """Return the created_at of the newest row fetched by the previous run, or None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f).get("created_at")
+
+
+def save_watermark(path: str, created_at: str) -> None:
+    with open(path, 'w') as f:
+        json.dump({"created_at": created_at}, f)
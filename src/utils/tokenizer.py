@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+import tiktoken
+
+ENCODING_NAME = "cl100k_base"
+MAX_EMBEDDING_TOKENS = 8192
+# Above this many texts, encode_batch spreads the work over threads
+BATCH_THRESHOLD = 16
+
+
+@lru_cache(maxsize=None)
+def get_encoding(name: str = ENCODING_NAME):
+    """Load the tiktoken encoder once per process"""
+    return tiktoken.get_encoding(name)
+
+
+def _fits(text: str, max_tokens: int) -> bool:
+    # Every token covers at least one UTF-8 byte, so a text with at most max_tokens bytes cannot exceed the limit
+    return len(text) <= max_tokens and len(text.encode('utf-8')) <= max_tokens
+
+
+def _encode_many(texts: list, num_threads: int) -> list:
+    encoding = get_encoding()
+    if len(texts) >= BATCH_THRESHOLD:
+        return encoding.encode_batch(texts, num_threads=num_threads)
+    return [encoding.encode(text) for text in texts]
+
+
+def truncate_text(text: str, max_tokens: int = MAX_EMBEDDING_TOKENS) -> str:
+    """Truncate a string to at most max_tokens tokens, skipping the tokenizer for short texts"""
+    if _fits(text, max_tokens):
+        return text
+    encoding = get_encoding()
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def truncate_texts(texts: list, max_tokens: int = MAX_EMBEDDING_TOKENS, num_threads: int = 8) -> list:
+    """Batched truncate_text: only texts that may exceed the limit are encoded, in parallel threads"""
+    texts = list(texts)
+    long_positions = [i for i, text in enumerate(texts) if not _fits(text, max_tokens)]
+    if not long_positions:
+        return texts
+    encoding = get_encoding()
+    encoded = _encode_many([texts[i] for i in long_positions], num_threads)
+    for i, tokens in zip(long_positions, encoded):
+        if len(tokens) > max_tokens:
+            texts[i] = encoding.decode(tokens[:max_tokens])
+    return texts
+
+
+def split_token_windows(text: str, window_tokens: int, overlap_tokens: int = 0) -> list:
+    """Split a text into windows of window_tokens tokens, consecutive windows sharing overlap_tokens tokens"""
+    if _fits(text, window_tokens):
+        return [text]
+    encoding = get_encoding()
+    tokens = encoding.encode(text)
+    if len(tokens) <= window_tokens:
+        return [text]
+    step = window_tokens - overlap_tokens
+    if step <= 0:
+        raise ValueError("overlap_tokens must be smaller than window_tokens")
+    return [encoding.decode(tokens[start:start + window_tokens])
+            for start in range(0, len(tokens) - overlap_tokens, step)]
+
+
+def count_tokens(texts: list, num_threads: int = 8) -> list:
+    """Number of tokens of each text"""
+    return [len(tokens) for tokens in _encode_many(list(texts), num_threads)]
+
+
+def token_counts_path(dataset_path: str) -> str:
+    """Token counts are stored next to the dataset they describe"""
+    return dataset_path + '.tokens.json'
+
+
+class TokenCounts:
+    """
+    Persistent per-record token counts (sidecar file next to a dataset).
+    Counts are keyed by a hash of the text, so edited records are simply counted again.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.counts = {}
+        self._dirty = False
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self.counts = json.load(f)
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def get_many(self, texts: list, num_threads: int = 8) -> list:
+        """Token count of each text, tokenizing only the texts that were never counted"""
+        keys = [self._key(text) for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in self.counts]
+        if missing:
+            for i, count in zip(missing, count_tokens([texts[i] for i in missing], num_threads)):
+                self.counts[keys[i]] = count
+            self._dirty = True
+        return [self.counts[key] for key in keys]
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.counts, f)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -1,33 +1,103 @@
 import json
 import os
-from openai import OpenAI
 from dotenv import load_dotenv
-from supabase import create_client, Client
-import tiktoken
+from utils.backends import PINECONE_MAX_TOP_K
+from utils.metrics import metrics
 
+# numpy, tqdm, tiktoken, the embedding cache and the local index are imported by the functions that use them:
+# every script imports this module, and JSONL helpers or `--help` should not pay ~150 ms for them
 
-load_dotenv()
+# orjson is an optional, much faster parser for large JSONL dumps
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Shared OpenAI client, created on first use (importing openai alone takes ~0.5 s)
+client = None
+
+def get_client():
+    global client
+    if client is None:
+        from openai import OpenAI
+        load_dotenv()
+        # OPENAI_BASE_URL optionally overrides the API endpoint, e.g. the local stand-in of src/benchmarks/standin_server.py
+        client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), base_url=os.environ.get("OPENAI_BASE_URL") or None)
+    return client
 
 def load_json(file_path):
     with open(file_path, 'r') as file:
         data = json.load(file)
     return data
 
-def load_jsonl(file_path):
-    with open(file_path, 'r') as file:
-        data = [json.loads(line) for line in file]
-    return data
+def iter_jsonl(file_path, fields=None, stats=None):
+    """
+    Stream records from a JSONL file one at a time.
+    fields: only keep these keys of each record (projection), None keeps every key
+    stats: optional dict that receives the number of 'records' read and 'malformed' lines skipped
+    """
+    records = 0
+    malformed = 0
+    with open(file_path, 'rb') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                record = _json_loads(line)
+            except ValueError:
+                malformed += 1
+                continue
+            if fields is not None:
+                record = {key: record[key] for key in fields if key in record}
+            records += 1
+            yield record
+
+    if stats is not None:
+        stats['records'] = records
+        stats['malformed'] = malformed
+    if malformed:
+        print(f"Skipped {malformed} malformed lines in {file_path}")
+
+def load_jsonl(file_path, fields=None):
+    return list(iter_jsonl(file_path, fields=fields))
 
-def get_embeddings_batch(texts, model="text-embedding-3-large"):
-    encoding = tiktoken.get_encoding("cl100k_base")
-    texts = [''.join(encoding.decode(encoding.encode(text)[:8192])) for text in texts]
-    response = client.embeddings.create(input=texts, model=model).data
-    embeddings = [res.embedding for res in response]
+def _create_embeddings(api_client, texts, model, dimensions=None):
+    kwargs = {'dimensions': dimensions} if dimensions else {}
+    with metrics.timer('openai.embeddings'):
+        response = api_client.embeddings.create(input=texts, model=model, **kwargs)
+    metrics.record_usage('openai.embeddings', getattr(response, 'usage', None))
+    metrics.increment('openai.embeddings.inputs', len(texts))
+    return [res.embedding for res in response.data]
+
+def embed_with_cache(texts, model="text-embedding-3-large", api_client=None, dimensions=None):
+    """
+    Embed texts, only sending the ones missing from the embedding cache to the API.
+    dimensions: shortened embedding size (text-embedding-3 models), None for the full size
+    """
+    from utils.embedding_cache import get_default_cache
+    api_client = api_client or get_client()
+    cache = get_default_cache()
+    if cache is None:
+        return _create_embeddings(api_client, texts, model, dimensions)
+
+    # Shortened embeddings are cached apart from the full-size ones
+    cache_model = f"{model}@{dimensions}" if dimensions else model
+    embeddings = cache.get_many(cache_model, texts)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if missing:
+        missing_texts = [texts[i] for i in missing]
+        new_embeddings = _create_embeddings(api_client, missing_texts, model, dimensions)
+        cache.put_many(cache_model, missing_texts, new_embeddings)
+        for i, embedding in zip(missing, new_embeddings):
+            embeddings[i] = embedding
     return embeddings
 
+def get_embeddings_batch(texts, model="text-embedding-3-large", dimensions=None):
+    from utils.tokenizer import MAX_EMBEDDING_TOKENS, truncate_texts
+    texts = truncate_texts(texts, MAX_EMBEDDING_TOKENS)
+    return embed_with_cache(texts, model=model, dimensions=dimensions)
+
 def format_to_vector_dict(vector_id: str, values: list, metadata: dict):
     return {
         "id": vector_id,
@@ -35,15 +105,132 @@ def format_to_vector_dict(vector_id: str, values: list, metadata: dict):
         "metadata": metadata,
     }
 
-def get_embedding(text, model="text-embedding-3-large"):
-    response = client.embeddings.create(input=[text], model=model).data
-    response = response[0].embedding
-    return response
-
-def retrieve_top_k_similar_docs(question, index, namespace, k=3):
-    encoding = tiktoken.get_encoding("cl100k_base")
-    question_chunked = ''.join(encoding.decode(encoding.encode(question)[:8192]))
-    question_embedding = get_embedding(question_chunked)
-    related_data = index.query(vector=question_embedding, namespace=namespace, include_metadata=True, top_k=k)
-    
-    return related_data["matches"]
\ No newline at end of file
+def get_embedding(text, model="text-embedding-3-large", dimensions=None):
+    return embed_with_cache([text], model=model, dimensions=dimensions)[0]
+
+def report_embedding_cache():
+    from utils.embedding_cache import get_default_cache
+    cache = get_default_cache()
+    if cache is not None:
+        print(cache.report())
+        metrics.increment('embedding_cache.hits', cache.hits)
+        metrics.increment('embedding_cache.misses', cache.misses)
+
+def retrieve_top_k_similar_docs(question, index, namespace, k=3, pooling=None, top_m=3, candidate_factor=5,
+                                include_metadata=False, metadata_filter=None, dimensions=None):
+    """
+    Top k matches of the question (id and score; the stored metadata only with include_metadata).
+    pooling: for chunked namespaces, 'max' or 'mean_top_m' pools the chunk scores into one score per RFP
+    metadata_filter: Pinecone metadata filter restricting the candidate RFPs (see utils.metadata_filter)
+    dimensions: embedding size the namespace was ingested with (utils.namespace_config; None: full size)
+    """
+    from utils.tokenizer import MAX_EMBEDDING_TOKENS, truncate_text
+    question_chunked = truncate_text(question, MAX_EMBEDDING_TOKENS)
+    question_embedding = get_embedding(question_chunked, dimensions=dimensions)
+    return query_top_k_similar_docs(question_embedding, index, namespace, k, pooling, top_m, candidate_factor,
+                                    include_metadata, metadata_filter)
+
+def query_top_k_similar_docs(question_embedding, index, namespace, k=3, pooling=None, top_m=3, candidate_factor=5,
+                             include_metadata=False, metadata_filter=None):
+    """
+    retrieve_top_k_similar_docs for an already embedded question.
+    Responses carry no metadata by default: callers hydrate the display fields of the final matches from the
+    dataset (utils.record_store), which keeps full-corpus responses small.
+    The metadata filter is applied by the index (Pinecone's query filter, the local index's field indexes).
+    """
+    from utils.local_index import LocalIndex
+    from utils.scoring import aggregate_matches
+    if not pooling or pooling == 'none':
+        related_data = index.query(vector=question_embedding, namespace=namespace, include_metadata=include_metadata,
+                                   top_k=k, filter=metadata_filter)
+        return related_data["matches"]
+
+    if isinstance(index, LocalIndex):
+        # Every chunk is scored locally, so pooling covers all RFPs without a larger top_k
+        with metrics.timer('local_index.query'):
+            return index.namespace(namespace).query_parents(question_embedding, k, pooling, top_m,
+                                                            include_metadata=include_metadata,
+                                                            metadata_filter=metadata_filter)
+
+    # Pinecone: over-fetch a few chunks per wanted RFP instead of k = number of chunks
+    candidate_k = min(k * top_m * candidate_factor, PINECONE_MAX_TOP_K)
+    related_data = index.query(vector=question_embedding, namespace=namespace, include_metadata=include_metadata,
+                               top_k=candidate_k, filter=metadata_filter)
+    matches = [{'id': match['id'], 'score': match['score']} for match in related_data["matches"]]
+    return aggregate_matches(matches, k, pooling, top_m)
+
+def max_scores_by_rfp(skill_embeddings, skill_ids, index, namespace, posting_ids=None, pooling='none', top_m=3,
+                      query_top_k=PINECONE_MAX_TOP_K, progress=False, metadata_filter=None, skip_errors=True):
+    """
+    Highest similarity of every RFP over the embedded skill sets, and the id of the skill set that produced it.
+    posting_ids: only keep these RFPs (None keeps all)
+    metadata_filter: only score the RFPs matching this Pinecone metadata filter (see utils.metadata_filter)
+    query_top_k: matches requested per skill set from Pinecone (local indexes always score every RFP)
+    pooling: for chunked namespaces, how chunk scores are pooled into one score per RFP ('max' or 'mean_top_m')
+    progress: show a progress bar over the per-skill-set Pinecone queries
+    skip_errors: report a failing Pinecone query and go on with the other skill sets (False: raise the error);
+                 when every query fails the error is raised either way, an empty result would look like no match
+    """
+    import numpy as np
+    from tqdm import tqdm
+    from utils.local_index import LocalIndex
+    from utils.scoring import aggregate_matches, max_scores_over_skill_sets, pooled_scores_over_skill_sets
+
+    rfp_scores = {}
+    rfp_best_skill = {}
+
+    if isinstance(index, LocalIndex):
+        # RFP vectors are held locally: one (skill sets x RFPs) matrix product, max-reduced per RFP
+        local_namespace = index.namespace(namespace)
+        # Only the rows passing the metadata filter are read and scored
+        rows = local_namespace.filter_rows(metadata_filter)
+        if pooling and pooling != 'none':
+            parents, group_index = local_namespace.parent_groups
+            if rows is not None:
+                groups, group_index = np.unique(group_index[rows], return_inverse=True)
+                parents = [parents[group] for group in groups]
+            best_scores, best_skill = pooled_scores_over_skill_sets(skill_embeddings, local_namespace.search_matrix,
+                                                                    group_index, len(parents), pooling, top_m,
+                                                                    rows=rows)
+            row_ids = parents
+        else:
+            best_scores, best_skill = max_scores_over_skill_sets(skill_embeddings, local_namespace.search_matrix,
+                                                                 rows=rows)
+            row_ids = local_namespace.ids if rows is None else [local_namespace.ids[row] for row in rows]
+        for posting_id, score, skill_idx in zip(row_ids, best_scores.tolist(), best_skill.tolist()):
+            if posting_ids is None or posting_id in posting_ids:
+                if posting_id not in rfp_scores or rfp_scores[posting_id] < score:
+                    rfp_scores[posting_id] = score
+                    rfp_best_skill[posting_id] = skill_ids[skill_idx]
+        return rfp_scores, rfp_best_skill
+
+    failed_queries = 0
+    for skill_id, skill_embedding in tqdm(zip(skill_ids, skill_embeddings), total=len(skill_ids),
+                                          desc="Processing skill sets", disable=not progress):
+        # Get similar documents for this skill set
+        try:
+            results = index.query(vector=skill_embedding, top_k=query_top_k, namespace=namespace,
+                                  filter=metadata_filter)
+        except Exception as e:
+            failed_queries += 1
+            if not skip_errors or failed_queries == len(skill_ids):
+                raise
+            print(f"Error querying Pinecone: {e}")
+            continue
+
+        matches = results['matches']
+        if pooling and pooling != 'none':
+            # Chunked namespace: pool the returned chunk scores per RFP
+            matches = aggregate_matches([{'id': doc['id'], 'score': doc['score']} for doc in matches],
+                                        query_top_k, pooling, top_m)
+
+        # Update scores with the highest similarity for each RFP
+        for doc in matches:
+            posting_id = str(doc['id'])
+            score = doc['score']
+            if posting_ids is None or posting_id in posting_ids:
+                if posting_id not in rfp_scores or rfp_scores[posting_id] < score:
+                    rfp_scores[posting_id] = score
+                    rfp_best_skill[posting_id] = skill_id
+
+    return rfp_scores, rfp_best_skill
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import sqlite3
+
+# Default location of the classifier verdict cache (project root /.cache)
+DEFAULT_VERDICT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '.cache', 'verdicts.sqlite')
+
+
+def description_key(namespace: str, description: str) -> str:
+    """Cache key of a verdict: classifier namespace (model + prompt version) + sha256 of the description"""
+    digest = hashlib.sha256(description.encode('utf-8')).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class VerdictCache:
+    """
+    SQLite backed cache of yes/no classifier verdicts keyed by description hash.
+    Only real answers are stored; failed classifications are never cached.
+    """
+
+    def __init__(self, path: str = DEFAULT_VERDICT_CACHE_PATH, namespace: str = "utility"):
+        self.path = path
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict INTEGER NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, descriptions: list) -> list:
+        """Return True/False for cached descriptions, None for the ones not classified yet"""
+        keys = [description_key(self.namespace, description) for description in descriptions]
+        found = {}
+        for i in range(0, len(keys), 500):
+            batch_keys = keys[i:i + 500]
+            placeholders = ','.join('?' * len(batch_keys))
+            rows = self._conn.execute(
+                f"SELECT key, verdict FROM verdicts WHERE key IN ({placeholders})", batch_keys
+            ).fetchall()
+            found.update({key: bool(verdict) for key, verdict in rows})
+
+        results = [found.get(key) for key in keys]
+        hit_count = sum(1 for result in results if result is not None)
+        self.hits += hit_count
+        self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, descriptions: list, verdicts: list) -> None:
+        rows = [(description_key(self.namespace, description), int(verdict))
+                for description, verdict in zip(descriptions, verdicts)]
+        self._conn.executemany("INSERT OR REPLACE INTO verdicts (key, verdict) VALUES (?, ?)", rows)
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()